@@ -2,23 +2,27 @@ import sys
 import os
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QVBoxLayout,
-    QHBoxLayout, QWidget, QLabel, QSlider, QFileDialog, QFrame, QCheckBox, QTextEdit, QInputDialog, QComboBox, QTabWidget, QListWidget, QGridLayout, QGroupBox, QToolTip, QSizePolicy
+    QHBoxLayout, QWidget, QLabel, QSlider, QFileDialog, QFrame, QCheckBox, QTextEdit, QInputDialog, QComboBox, QTabWidget, QListWidget, QGridLayout, QGroupBox, QToolTip, QSizePolicy,
+    QListWidgetItem, QDialog, QDialogButtonBox, QLineEdit
 )
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap, QImage, QPainter, QLinearGradient, QColor, QFont
-from PIL import Image, ImageQt, ImageFilter
-import numpy as np
+from PyQt6.QtCore import Qt, QObject, QSize, QTimer, pyqtSignal
+from PyQt6.QtGui import QPixmap, QImage, QPainter, QLinearGradient, QColor, QFont, QIcon
 import colorsys
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from Styles import *  # Import all styles
-from ImageEffects import (
-    adjust_pixel, apply_color_option, apply_glow_effect, 
-    save_image_with_transparency, get_gradient_colors, 
-    adjust_image_size, adjust_size_for_glow
-)
+from TiledViewer import TiledImageView
+# NumPy, Pillow and the image-processing modules are imported where they are
+# first used, so the window can appear before they have loaded
+STARTUP_TIME = time.perf_counter()
 
 # Global constants
 COLOR_TOLERANCE = 2  # Tolerance for background color detection
+THUMBNAIL_SIZE = 96  # Size of the filmstrip thumbnails in pixels
+THUMBNAIL_WORKERS = 4  # Threads decoding and caching filmstrip thumbnails
+LISTING_CHUNK = 500  # Listed file names added to the filmstrip per event loop pass
+LISTING_POLL_MS = 50  # Wait between checks of a directory listing still in progress
 
 # Define option_descriptions with appropriate descriptions for each option
 option_descriptions = {
@@ -39,6 +43,11 @@ option_descriptions = {
     "Pastel Palette": "Reduces saturation and increases brightness for a pastel look."
 }
 
+class _ThumbnailSignals(QObject):
+    # generation, filmstrip row, thumbnail QImage
+    loaded = pyqtSignal(int, int, object)
+
+
 class EffectListWidget(QListWidget):
     """Widget to display all applied effects"""
     def __init__(self):
@@ -106,6 +115,8 @@ class ColorBalanceApp(QMainWindow):
         self.current_directory = ""
         self.current_image_index = 0
         self.image_files = []
+        self.listing = None  # DirectoryListing of the current directory
+        self.listing_drained = True  # Every listed name is in image_files
         # Create main widget and layout
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -145,6 +156,14 @@ class ColorBalanceApp(QMainWindow):
         self.view_directory_button.clicked.connect(self.open_directory_explorer)
         load_buttons_layout.addWidget(self.view_directory_button)
         
+        # Add preview background toggle button
+        self.background_toggle_button = QPushButton("◐")
+        self.background_toggle_button.setToolTip("Toggle preview background between black and white")
+        self.background_toggle_button.setFixedWidth(30)
+        self.background_toggle_button.setStyleSheet(VIEW_DIRECTORY_BUTTON_STYLE)
+        self.background_toggle_button.clicked.connect(self.toggle_background)
+        load_buttons_layout.addWidget(self.background_toggle_button)
+        
         top_layout.addLayout(load_buttons_layout)
         # Directory display label
         self.directory_label = QLabel()
@@ -155,6 +174,19 @@ class ColorBalanceApp(QMainWindow):
         font.setPointSize(font.pointSize() + 2)
         self.directory_label.setFont(font)
         top_layout.addWidget(self.directory_label)
+        # Which files to list: glob patterns separated by semicolons, optionally in subfolders
+        listing_layout = QHBoxLayout()
+        self.file_pattern_edit = QLineEdit("image*.png")
+        self.file_pattern_edit.setFont(button_font)
+        self.file_pattern_edit.setToolTip("File name patterns to load, e.g. image*.png; *.jpg")
+        self.file_pattern_edit.editingFinished.connect(self.relist_directory)
+        listing_layout.addWidget(self.file_pattern_edit, 1)
+        self.recursive_checkbox = QCheckBox("Subfolders")
+        self.recursive_checkbox.setFont(button_font)
+        self.recursive_checkbox.setStyleSheet(TRANSPARENCY_CHECKBOX_STYLE)
+        self.recursive_checkbox.toggled.connect(self.relist_directory)
+        listing_layout.addWidget(self.recursive_checkbox)
+        top_layout.addLayout(listing_layout)
         # Add top buttons to left layout
         left_layout.addWidget(top_buttons)
         # Create sliders
@@ -199,6 +231,9 @@ class ColorBalanceApp(QMainWindow):
         glow_tab = QWidget()
         glow_tab.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Maximum)
         
+        gallery_tab = QWidget()
+        QVBoxLayout(gallery_tab).setContentsMargins(5, 5, 5, 5)
+        
         color_layout = QVBoxLayout(color_tab)
         color_layout.setContentsMargins(5, 5, 5, 5)
         color_layout.setSpacing(2)  # Reduce spacing even further
@@ -239,25 +274,301 @@ class ColorBalanceApp(QMainWindow):
         color_layout.addWidget(hue_controls)
         color_layout.addStretch(1)  # Add stretch to prevent expansion
         
+        # The Special Effects and Glow/Border tabs are filled in once the window is up
+        self.effects_tab = effects_tab
+        self.glow_tab = glow_tab
+        self.gallery_tab = gallery_tab
+        self.effect_gallery = None
+        self.button_font = button_font
+        
+        # Add tabs
+        tabs.addTab(color_tab, "Color Adjustments")
+        tabs.addTab(effects_tab, "Special Effects")
+        tabs.addTab(glow_tab, "Glow/Border")
+        tabs.addTab(gallery_tab, "Gallery")
+        
+        self.pending_tabs = {
+            tabs.indexOf(effects_tab): self.build_effects_tab,
+            tabs.indexOf(glow_tab): self.build_glow_tab,
+            tabs.indexOf(gallery_tab): self.build_gallery_tab
+        }
+        tabs.currentChanged.connect(self.build_tab)
+        
+        # Add tabs to left layout
+        left_layout.addWidget(tabs)
+        
+        # Add Applied Effects List with smaller height
+        effects_label = QLabel("Applied Effects:")
+        effects_label.setFont(button_font)
+        left_layout.addWidget(effects_label)
+        
+        self.effects_list = EffectListWidget()
+        self.effects_list.setMaximumHeight(120)  # Increased height for effects list
+        left_layout.addWidget(self.effects_list)
+        
+        # Add status text box with larger height
+        self.status_text = QTextEdit()
+        self.status_text.setReadOnly(True)
+        self.status_text.setFont(button_font)
+        self.status_text.setStyleSheet(STATUS_TEXT_STYLE)
+        self.status_text.setMinimumHeight(100)  # Changed from 200 to 100
+        left_layout.addWidget(self.status_text)
+        
+        # Create bottom buttons with styling
+        bottom_buttons_layout = QHBoxLayout()
+        
+        # Create clear button
+        self.clear_status_button = QPushButton("🗑️")  # Unicode trash can emoji
+        self.clear_status_button.setToolTip("Clear status messages")
+        self.clear_status_button.setFixedWidth(30)
+        self.clear_status_button.setStyleSheet(CLEAR_STATUS_BUTTON_STYLE)
+        self.clear_status_button.clicked.connect(self.status_text.clear)
+        
+        # Create other buttons with exact sizing
+        self.reset_button = QPushButton("Reset")
+        reset_width = self.reset_button.fontMetrics().horizontalAdvance("Reset") + 40
+        self.reset_button.setFixedWidth(reset_width)
+        
+        self.save_button = QPushButton("Save Image")
+        save_width = self.save_button.fontMetrics().horizontalAdvance("Save Image") + 40
+        self.save_button.setFixedWidth(save_width)
+        
+        self.convert_directory_button = QPushButton("Convert Directory")
+        convert_width = self.convert_directory_button.fontMetrics().horizontalAdvance("Convert Directory") + 40
+        self.convert_directory_button.setFixedWidth(convert_width)
+        
+        # Add buttons to bottom layout
+        bottom_buttons_layout.addWidget(self.clear_status_button)
+        bottom_buttons_layout.addWidget(self.reset_button)
+        bottom_buttons_layout.addWidget(self.save_button)
+        bottom_buttons_layout.addWidget(self.convert_directory_button)
+        left_layout.addLayout(bottom_buttons_layout)
+        
+        # Add transparency checkbox
+        self.transparency_checkbox = QCheckBox("Save Image(s) with Transparent Background")
+        self.transparency_checkbox.setChecked(True)  # Set default to checked
+        self.transparency_checkbox.setFont(button_font)
+        self.transparency_checkbox.setStyleSheet(TRANSPARENCY_CHECKBOX_STYLE)
+        # Only the preview changes, so no re-render is needed
+        self.transparency_checkbox.toggled.connect(self.update_image)
+        left_layout.addWidget(self.transparency_checkbox)
+        
+        # Keep decoded pixels on disk so reloading and re-converting skip decompression
+        self.pixel_cache_checkbox = QCheckBox("Cache Decoded Pixels")
+        self.pixel_cache_checkbox.setFont(button_font)
+        self.pixel_cache_checkbox.setStyleSheet(TRANSPARENCY_CHECKBOX_STYLE)
+        left_layout.addWidget(self.pixel_cache_checkbox)
+        
+        # Output format used by directory conversion
+        output_format_layout = QHBoxLayout()
+        output_format_label = QLabel("Output Format:")
+        output_format_label.setFont(button_font)
+        output_format_layout.addWidget(output_format_label)
+        self.output_format_combo = QComboBox()
+        self.output_format_combo.addItem("PNG")  # The others are added by finish_startup
+        self.output_format_combo.setToolTip("Faster formats trade file size for encoding speed")
+        output_format_layout.addWidget(self.output_format_combo, 1)
+        # The effect and output settings, for converting without the window (WatchFolder.py)
+        self.save_settings_button = QPushButton("Save Settings...")
+        self.save_settings_button.setFont(button_font)
+        self.save_settings_button.setToolTip("Save the current effects and output options for WatchFolder.py")
+        self.save_settings_button.clicked.connect(self.save_settings)
+        output_format_layout.addWidget(self.save_settings_button)
+        # The whole conversion as a resumable job (BatchJob.py)
+        self.save_job_button = QPushButton("Save Job...")
+        self.save_job_button.setFont(button_font)
+        self.save_job_button.setToolTip("Save converting the loaded directory as a job for BatchJob.py")
+        self.save_job_button.clicked.connect(self.save_job)
+        output_format_layout.addWidget(self.save_job_button)
+        left_layout.addLayout(output_format_layout)
+        
+        # PNG compression overrides: zlib level and strategy ("Auto" keeps the format's own)
+        png_options_layout = QHBoxLayout()
+        png_level_label = QLabel("PNG Level:")
+        png_level_label.setFont(button_font)
+        png_options_layout.addWidget(png_level_label)
+        self.png_level_combo = QComboBox()
+        self.png_level_combo.addItems(["Auto"] + [str(level) for level in range(10)])
+        self.png_level_combo.setToolTip("zlib compression level of PNG outputs, 0 (fastest) to 9 (smallest)")
+        png_options_layout.addWidget(self.png_level_combo, 1)
+        png_strategy_label = QLabel("Strategy:")
+        png_strategy_label.setFont(button_font)
+        png_options_layout.addWidget(png_strategy_label)
+        self.png_strategy_combo = QComboBox()
+        self.png_strategy_combo.addItem("Auto")  # The strategies are added by finish_startup
+        self.png_strategy_combo.setToolTip("zlib strategy of PNG outputs; RLE suits flat-colored letters")
+        png_options_layout.addWidget(self.png_strategy_combo, 1)
+        left_layout.addLayout(png_options_layout)
+        
+        # Create exit button with adjusted size
+        self.exit_button = QPushButton("Exit")
+        self.exit_button.setStyleSheet(EXIT_BUTTON_STYLE)
+        left_layout.addWidget(self.exit_button)
+        
+        # Set fonts and connect signals
+        for button in [self.reset_button, self.save_button, 
+                      self.convert_directory_button, self.exit_button]:
+            button.setFont(button_font)
+        self.transparency_checkbox.setFont(button_font)
+        
+        self.reset_button.clicked.connect(self.reset_adjustments)
+        self.save_button.clicked.connect(self.save_image)
+        self.convert_directory_button.clicked.connect(self.convert_directory)
+        self.exit_button.clicked.connect(self.close)
+        
+        # Create navigation and image display with fixed proportions
+        self.image_container = QWidget()
+        image_layout = QVBoxLayout(self.image_container)
+        image_layout.setContentsMargins(0, 0, 0, 0)
+        
+        # Zoom with the wheel, pan by dragging, double click to fit
+        self.image_view = TiledImageView()
+        self.image_view.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        
+        self.prev_button = QPushButton("←")
+        self.next_button = QPushButton("→")
+        nav_font = QFont()
+        nav_font.setPointSize(48)
+        self.prev_button.setFont(nav_font)
+        self.next_button.setFont(nav_font)
+        self.prev_button.clicked.connect(self.prev_image)
+        self.next_button.clicked.connect(self.next_image)
+        
+        # Add image viewer to right side with fixed layout
+        nav_layout = QHBoxLayout()
+        nav_layout.setContentsMargins(0, 0, 0, 0)
+        nav_layout.addWidget(self.prev_button)
+        nav_layout.addWidget(self.image_view, 1)  # Use a stretch factor of 1
+        nav_layout.addWidget(self.next_button)
+        
+        image_layout.addLayout(nav_layout, 1)
+        
+        # Filmstrip of cached thumbnails for the whole directory
+        self.filmstrip = QListWidget()
+        self.filmstrip.setViewMode(QListWidget.ViewMode.IconMode)
+        self.filmstrip.setFlow(QListWidget.Flow.LeftToRight)
+        self.filmstrip.setWrapping(False)
+        self.filmstrip.setMovement(QListWidget.Movement.Static)
+        self.filmstrip.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.filmstrip.setFixedHeight(THUMBNAIL_SIZE + 45)
+        self.filmstrip.setStyleSheet(FILMSTRIP_STYLE)
+        self.filmstrip.currentRowChanged.connect(self.select_image)
+        # Thumbnails are made on a thread pool and handed back to the GUI thread
+        self.thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="Thumbnails")
+        self.thumbnail_signals = _ThumbnailSignals()
+        self.thumbnail_signals.loaded.connect(self.show_thumbnail)
+        image_layout.addWidget(self.filmstrip)
+        layout.addWidget(self.image_container, 1)  # Use a stretch factor of 1
+        
+        # Initialize remaining properties
+        self.original_image = None
+        self.adjusted_image = None
+        self.color_offsets = {
+            "cyan_red": 0,
+            "magenta_green": 0,
+            "yellow_blue": 0,
+            "hue": 0
+        }
+        self.negative_applied = False
+        self.background_color = None
+        self.display_background_as_black = True
+        self.thumbnail_cache = None
+        self.thumbnail_generation = 0  # Bumped on every directory load to cancel stale work
+        self.active_effects = {
+            "Color Adjustments": [],
+            "Special Effects": [],
+            "Glow/Border Effects": []
+        }
+        
+        # Left panel layout
+        left_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        
+        # Add new state variables for tracking letter effects
+        self.letter_image = None  # Stores the letter with its current effects
+        self.hsv_planes = None  # HSV decomposition of original_image
+        self.color_cache = None  # (slider values, [color-adjusted letter, HSVPlanes or None])
+        self.input_digest = None  # Digest of the current image file for the render cache
+        self.render_cache = None  # Created by finish_startup
+        self.glow_canvas = None  # Padded glow buffer, reused while the padded size stays the same
+        self.startup_finished = False
+        self.first_render_logged = False
+        self.current_letter_effects = {
+            "slider_values": {},  # Store actual slider values
+            "special_effect": "None"
+        }
+        
+        # Initialize slider values
+        for key in ["cyan_red", "magenta_green", "yellow_blue", "hue"]:
+            self.current_letter_effects["slider_values"][key] = 0
+
+    def showEvent(self, event):
+        """Override show event to properly maximize after window is created"""
+        super().showEvent(event)
+        if self._should_maximize:
+            self._should_maximize = False
+            # Process events before attempting to maximize
+            QApplication.processEvents()
+            # Get available geometry to respect screen boundaries
+            available_geometry = self.screen().availableGeometry()
+            self.setGeometry(available_geometry)
+            self.status_text.append(f"Window ready in {(time.perf_counter() - STARTUP_TIME) * 1000:.0f} ms")
+            # Load the rest once the first frame has been painted
+            QTimer.singleShot(0, self.finish_startup)
+
+    def build_tab(self, index):
+        """Fill in a deferred tab the first time it is needed"""
+        build = self.pending_tabs.pop(index, None)
+        if build:
+            build()
+
+    def build_effects_tab(self):
+        """Create the Special Effects tab's effect buttons"""
+        effects_layout = self.effects_tab.layout()
+        
         # Special Effects Tab - Replace dropdown with buttons
         effects_grid = QGridLayout()
         effects_layout.addLayout(effects_grid)
         # Enable mouse tracking for the entire effects tab
-        effects_tab.setMouseTracking(True)
+        self.effects_tab.setMouseTracking(True)
         # Create effect buttons in two columns
         for i, effect in enumerate(self.available_effects):
             btn = QPushButton(effect)
-            btn.setFont(button_font)
+            btn.setFont(self.button_font)
             btn.setCheckable(True)
             btn.setMinimumHeight(30)
-            if effect == "None":
+            if effect == self.current_effect:
                 btn.setChecked(True)
             # Just set the tooltip text directly from option_descriptions
             if effect in option_descriptions:
                 btn.setToolTip(option_descriptions[effect])
             btn.clicked.connect(lambda checked, e=effect: self.select_effect(e))
             effects_grid.addWidget(btn, i // 2, i % 2)
+        
+        # Render every selected effect for the whole directory in one pass
+        self.export_effects_button = QPushButton("Export All Effects...")
+        self.export_effects_button.setFont(self.button_font)
+        self.export_effects_button.setToolTip("Convert the directory into one output directory per effect")
+        self.export_effects_button.clicked.connect(self.export_all_effects)
+        effects_layout.addWidget(self.export_effects_button)
+        
+        # Exchange grades with other tools as .cube 3D LUTs
+        lut_layout = QHBoxLayout()
+        effects_layout.addLayout(lut_layout)
+        self.import_lut_button = QPushButton("Import LUT...")
+        self.import_lut_button.setFont(self.button_font)
+        self.import_lut_button.setToolTip("Apply a .cube 3D LUT as the special effect")
+        self.import_lut_button.clicked.connect(self.import_lut)
+        lut_layout.addWidget(self.import_lut_button)
+        self.export_lut_button = QPushButton("Export LUT...")
+        self.export_lut_button.setFont(self.button_font)
+        self.export_lut_button.setToolTip("Save the color sliders and special effect as a .cube 3D LUT (without glow/border)")
+        self.export_lut_button.clicked.connect(self.export_lut)
+        lut_layout.addWidget(self.export_lut_button)
 
+    def build_glow_tab(self):
+        """Create the Glow/Border tab's width, color and effect controls"""
+        glow_layout = self.glow_tab.layout()
+        
         # Glow/Border Tab Layout
         # Width control with label and slider on same line
         width_layout = QHBoxLayout()
@@ -381,12 +692,12 @@ class ColorBalanceApp(QMainWindow):
         glow_layout.addLayout(button_layout)
         
         # Enable mouse tracking for the glow tab
-        glow_tab.setMouseTracking(True)
+        self.glow_tab.setMouseTracking(True)
         
         # Add None button first
         self.none_glow_button = QPushButton("None")
         self.none_glow_button.setCheckable(True)
-        self.none_glow_button.setChecked(True)
+        self.none_glow_button.setChecked(self.current_glow == "None")
         self.none_glow_button.setToolTip("Remove glow/border effect")
         self.none_glow_button.setMouseTracking(True)
         self.none_glow_button.clicked.connect(lambda: self.handle_glow_click("None"))
@@ -394,174 +705,66 @@ class ColorBalanceApp(QMainWindow):
         
         self.glow_button = QPushButton("Apply Color Glow")
         self.glow_button.setCheckable(True)
+        self.glow_button.setChecked(self.current_glow == "glow")
         self.glow_button.setToolTip("Applies a soft colored glow around the edges")
         self.glow_button.setMouseTracking(True)
         self.glow_button.clicked.connect(lambda: self.handle_glow_click("glow"))
         
         self.border_button = QPushButton("Apply Color Border")
         self.border_button.setCheckable(True)
+        self.border_button.setChecked(self.current_glow == "border")
         self.border_button.setToolTip("Applies a solid colored border around the edges")
         self.border_button.setMouseTracking(True)
         self.border_button.clicked.connect(lambda: self.handle_glow_click("border"))
         
         button_layout.addWidget(self.glow_button)
         button_layout.addWidget(self.border_button)
-        
-        # Add tabs
-        tabs.addTab(color_tab, "Color Adjustments")
-        tabs.addTab(effects_tab, "Special Effects")
-        tabs.addTab(glow_tab, "Glow/Border")
-        
-        # Add tabs to left layout
-        left_layout.addWidget(tabs)
-        
-        # Add Applied Effects List with smaller height
-        effects_label = QLabel("Applied Effects:")
-        effects_label.setFont(button_font)
-        left_layout.addWidget(effects_label)
-        
-        self.effects_list = EffectListWidget()
-        self.effects_list.setMaximumHeight(120)  # Increased height for effects list
-        left_layout.addWidget(self.effects_list)
-        
-        # Add status text box with larger height
-        self.status_text = QTextEdit()
-        self.status_text.setReadOnly(True)
-        self.status_text.setFont(button_font)
-        self.status_text.setStyleSheet(STATUS_TEXT_STYLE)
-        self.status_text.setMinimumHeight(100)  # Changed from 200 to 100
-        left_layout.addWidget(self.status_text)
-        
-        # Create bottom buttons with styling
-        bottom_buttons_layout = QHBoxLayout()
-        
-        # Create clear button
-        self.clear_status_button = QPushButton("🗑️")  # Unicode trash can emoji
-        self.clear_status_button.setToolTip("Clear status messages")
-        self.clear_status_button.setFixedWidth(30)
-        self.clear_status_button.setStyleSheet(CLEAR_STATUS_BUTTON_STYLE)
-        self.clear_status_button.clicked.connect(self.status_text.clear)
-        
-        # Create other buttons with exact sizing
-        self.reset_button = QPushButton("Reset")
-        reset_width = self.reset_button.fontMetrics().horizontalAdvance("Reset") + 40
-        self.reset_button.setFixedWidth(reset_width)
-        
-        self.save_button = QPushButton("Save Image")
-        save_width = self.save_button.fontMetrics().horizontalAdvance("Save Image") + 40
-        self.save_button.setFixedWidth(save_width)
-        
-        self.convert_directory_button = QPushButton("Convert Directory")
-        convert_width = self.convert_directory_button.fontMetrics().horizontalAdvance("Convert Directory") + 40
-        self.convert_directory_button.setFixedWidth(convert_width)
-        
-        # Add buttons to bottom layout
-        bottom_buttons_layout.addWidget(self.clear_status_button)
-        bottom_buttons_layout.addWidget(self.reset_button)
-        bottom_buttons_layout.addWidget(self.save_button)
-        bottom_buttons_layout.addWidget(self.convert_directory_button)
-        left_layout.addLayout(bottom_buttons_layout)
-        
-        # Add transparency checkbox
-        self.transparency_checkbox = QCheckBox("Save Image(s) with Transparent Background")
-        self.transparency_checkbox.setChecked(True)  # Set default to checked
-        self.transparency_checkbox.setFont(button_font)
-        self.transparency_checkbox.setStyleSheet(TRANSPARENCY_CHECKBOX_STYLE)
-        left_layout.addWidget(self.transparency_checkbox)
-        
-        # Create exit button with adjusted size
-        self.exit_button = QPushButton("Exit")
-        self.exit_button.setStyleSheet(EXIT_BUTTON_STYLE)
-        left_layout.addWidget(self.exit_button)
-        
-        # Set fonts and connect signals
-        for button in [self.reset_button, self.save_button, 
-                      self.convert_directory_button, self.exit_button]:
-            button.setFont(button_font)
-        self.transparency_checkbox.setFont(button_font)
-        
-        self.reset_button.clicked.connect(self.reset_adjustments)
-        self.save_button.clicked.connect(self.save_image)
-        self.convert_directory_button.clicked.connect(self.convert_directory)
-        self.exit_button.clicked.connect(self.close)
-        
-        # Create navigation and image display with fixed proportions
-        self.image_container = QWidget()
-        image_layout = QVBoxLayout(self.image_container)
-        image_layout.setContentsMargins(0, 0, 0, 0)
-        
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.image_label.setStyleSheet(IMAGE_LABEL_STYLE)
-        self.image_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        
-        self.prev_button = QPushButton("←")
-        self.next_button = QPushButton("→")
-        nav_font = QFont()
-        nav_font.setPointSize(48)
-        self.prev_button.setFont(nav_font)
-        self.next_button.setFont(nav_font)
-        self.prev_button.clicked.connect(self.prev_image)
-        self.next_button.clicked.connect(self.next_image)
-        
-        # Add image viewer to right side with fixed layout
-        nav_layout = QHBoxLayout()
-        nav_layout.setContentsMargins(0, 0, 0, 0)
-        nav_layout.addWidget(self.prev_button)
-        nav_layout.addWidget(self.image_label, 1)  # Use a stretch factor of 1
-        nav_layout.addWidget(self.next_button)
-        
-        image_layout.addLayout(nav_layout)
-        layout.addWidget(self.image_container, 1)  # Use a stretch factor of 1
-        
-        # Initialize remaining properties
-        self.original_image = None
-        self.adjusted_image = None
-        self.color_offsets = {
-            "cyan_red": 0,
-            "magenta_green": 0,
-            "yellow_blue": 0,
-            "hue": 0
-        }
-        self.negative_applied = False
-        self.background_color = None
-        self.active_effects = {
-            "Color Adjustments": [],
-            "Special Effects": [],
-            "Glow/Border Effects": []
-        }
-        
-        # Left panel layout
-        left_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        
+
         # Gradient group layout
         gradient_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
         gradient_layout.setSpacing(5)
         
         # Make gradient controls visible by default
         self.gradient_container.setVisible(True)
-        
-        # Add new state variables for tracking letter effects
-        self.letter_image = None  # Stores the letter with its current effects
-        self.current_letter_effects = {
-            "slider_values": {},  # Store actual slider values
-            "special_effect": "None"
-        }
-        
-        # Initialize slider values
-        for key in ["cyan_red", "magenta_green", "yellow_blue", "hue"]:
-            self.current_letter_effects["slider_values"][key] = 0
 
-    def showEvent(self, event):
-        """Override show event to properly maximize after window is created"""
-        super().showEvent(event)
-        if self._should_maximize:
-            self._should_maximize = False
-            # Process events before attempting to maximize
-            QApplication.processEvents()
-            # Get available geometry to respect screen boundaries
-            available_geometry = self.screen().availableGeometry()
-            self.setGeometry(available_geometry)
+    def build_gallery_tab(self):
+        """Create the gallery of every preset rendered on a proxy of the current image"""
+        from EffectGallery import EffectGallery
+        self.effect_gallery = EffectGallery(self.available_effects)
+        self.effect_gallery.setStyleSheet(FILMSTRIP_STYLE)
+        self.effect_gallery.setToolTip("Click a preview to apply it at full size")
+        self.effect_gallery.effect_chosen.connect(self.select_effect)
+        self.effect_gallery.glow_chosen.connect(self.handle_glow_click)
+        self.gallery_tab.layout().addWidget(self.effect_gallery)
+        self.refresh_gallery()
+
+    def refresh_gallery(self):
+        """Update the gallery for the current image and settings"""
+        if not self.effect_gallery or not self.original_image:
+            return
+        image_path = os.path.join(self.current_directory, self.image_files[self.current_image_index])
+        try:
+            modified = os.stat(image_path).st_mtime_ns
+        except OSError:
+            modified = None
+        image_key = (image_path, modified, self.original_image.size)
+        self.effect_gallery.refresh(image_key, self.original_image, self.get_effect_parameters())
+
+    def finish_startup(self):
+        """Load the image-processing modules and build the deferred tabs, once"""
+        if self.startup_finished:
+            return
+        self.startup_finished = True
+        from ImageEffects import available_output_formats, PNG_STRATEGIES
+        from RenderCache import RenderCache
+        
+        self.output_format_combo.addItems([name for name in available_output_formats() if name != "PNG"])
+        self.png_strategy_combo.addItems(list(PNG_STRATEGIES))
+        self.render_cache = RenderCache()
+        # Renders are stored in order on one thread, so a slider release does not wait for the disk
+        self.render_cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="RenderCacheWriter")
+        for index in list(self.pending_tabs):
+            self.build_tab(index)
 
     def create_slider(self, label_text, offset_key, min_val=-100, max_val=100):
         """Creates a slider without adding it to any layout"""
@@ -580,6 +783,32 @@ class ColorBalanceApp(QMainWindow):
         # Return both widgets so they can be added to appropriate layout later
         return slider_label, slider
 
+    def get_slider_offsets(self):
+        """Return the (cyan-red, magenta-green, yellow-blue, hue) offsets from the sliders"""
+        from ImageEffects import slider_offsets
+        return slider_offsets(
+            self.sliders["cyan_red"].value(),
+            self.sliders["magenta_green"].value(),
+            self.sliders["yellow_blue"].value(),
+            self.sliders["hue"].value()
+        )
+
+    def get_effect_parameters(self):
+        """Return the full effect parameter set as a plain, JSON-serializable dict"""
+        return {
+            "sliders": {key: slider.value() for key, slider in self.sliders.items()},
+            "effect": self.current_effect,
+            "glow": {
+                "type": self.current_glow,
+                "width": self.border_width_slider.value(),
+                "start_hue": self.start_color_slider.value(),
+                "end_hue": self.end_color_slider.value(),
+                "double_color": self.single_color_mode.isChecked(),
+                "gradient_type": self.gradient_type.currentText(),
+                "gradient_direction": self.gradient_direction.currentText()
+            }
+        }
+
     def load_directory(self):
         onedrive_path = os.path.expanduser("~/OneDrive")
         default_path = os.path.join(onedrive_path, "VectorProgram", "Scripts", "Alphabet Scripts", "Alphabets")
@@ -587,12 +816,95 @@ class ColorBalanceApp(QMainWindow):
         if directory:
             self.current_directory = directory
             self.directory_label.setText(directory.split('/')[-1])
-            self.image_files = [f for f in os.listdir(directory)
-                                if f.lower().startswith('image') and f.lower().endswith('.png')]
-            self.image_files.sort()
-            self.current_image_index = 0
+            self.list_directory()
+
+    def relist_directory(self):
+        """List the loaded directory again after the file pattern or subfolder option changed"""
+        if self.current_directory:
+            self.list_directory()
+
+    def list_directory(self):
+        """Start listing the current directory in the background and fill the filmstrip as names arrive"""
+        from DirectoryScanner import DirectoryListing, parse_patterns
+        from ThumbnailCache import ThumbnailCache
+        if self.listing:
+            self.listing.cancel()
+        self.listing = DirectoryListing(self.current_directory, parse_patterns(self.file_pattern_edit.text()),
+                                        self.recursive_checkbox.isChecked())
+        self.listing_drained = False
+        self.image_files = []
+        self.current_image_index = 0
+        self.filmstrip.clear()
+
+        self.thumbnail_cache = ThumbnailCache(self.current_directory, THUMBNAIL_SIZE)
+        self.thumbnail_generation += 1
+        generation = self.thumbnail_generation
+        QTimer.singleShot(0, lambda: self.populate_filmstrip(generation))
+        QTimer.singleShot(0, lambda: self.load_thumbnails(generation, 0))
+
+    def populate_filmstrip(self, generation):
+        """Add the names listed so far to the filmstrip a chunk at a time so the UI stays responsive"""
+        if generation != self.thumbnail_generation:
+            return  # A different directory has been loaded since
+        listing = self.listing
+        # Read finished first: once it is set, files holds every name
+        finished = listing.finished
+        start = len(self.image_files)
+        new_files = listing.files[start:start + LISTING_CHUNK]
+        if new_files:
+            self.image_files.extend(new_files)
+            self.filmstrip.blockSignals(True)
+            for image_file in new_files:
+                self.filmstrip.addItem(QListWidgetItem(image_file))
+            self.filmstrip.blockSignals(False)
+            if start == 0:
+                self.load_current_image()  # Show the first image without waiting for the rest
+
+        if len(self.image_files) < len(listing.files):
+            QTimer.singleShot(0, lambda: self.populate_filmstrip(generation))
+        elif not finished:
+            QTimer.singleShot(LISTING_POLL_MS, lambda: self.populate_filmstrip(generation))
+        else:
+            self.listing_drained = True
+            if listing.error:
+                self.status_text.append(f"Error listing directory: {listing.error}")
             self.status_text.append(f"Found {len(self.image_files)} image files in directory")
-            self.status_text.repaint()
+
+    def load_thumbnails(self, generation, start, chunk_size=8):
+        """Queue thumbnails for the files listed from start on, then follow the listing until it is drained"""
+        if generation != self.thumbnail_generation:
+            return  # A different directory has been loaded since
+        end = len(self.image_files)
+        for chunk_start in range(start, end, chunk_size):
+            rows = [(row, self.image_files[row]) for row in range(chunk_start, min(chunk_start + chunk_size, end))]
+            self.thumbnail_executor.submit(self.make_thumbnails, generation, self.thumbnail_cache, rows)
+        if not self.listing_drained:
+            # Wait for more names from the listing
+            QTimer.singleShot(LISTING_POLL_MS, lambda: self.load_thumbnails(generation, end, chunk_size))
+
+    def make_thumbnails(self, generation, thumbnail_cache, rows):
+        """Worker thread: decode or read the cached thumbnails of (row, file name) pairs"""
+        for row, image_file in rows:
+            if generation != self.thumbnail_generation:
+                return  # A different directory has been loaded since
+            try:
+                thumbnail = thumbnail_cache.get(image_file)
+            except OSError:
+                continue  # Leave the placeholder for unreadable files
+            data = thumbnail.tobytes("raw", "RGBA")
+            qimage = QImage(data, thumbnail.width, thumbnail.height, thumbnail.width * 4,
+                            QImage.Format.Format_RGBA8888).copy()
+            self.thumbnail_signals.loaded.emit(generation, row, qimage)
+
+    def show_thumbnail(self, generation, row, qimage):
+        # Pixmaps can only be made on the GUI thread
+        if generation == self.thumbnail_generation and row < self.filmstrip.count():
+            self.filmstrip.item(row).setIcon(QIcon(QPixmap.fromImage(qimage)))
+
+    def select_image(self, row):
+        """Show the image picked in the filmstrip"""
+        if 0 <= row < len(self.image_files) and row != self.current_image_index:
+            self.current_image_index = row
             self.load_current_image()
 
     def load_current_image(self):
@@ -600,63 +912,59 @@ class ColorBalanceApp(QMainWindow):
         if not self.image_files:
             return
             
+        # Keep the filmstrip selection in sync without re-entering select_image
+        self.filmstrip.blockSignals(True)
+        self.filmstrip.setCurrentRow(self.current_image_index)
+        self.filmstrip.blockSignals(False)
+        
+        self.finish_startup()
+        from PIL import Image
+        from PixelCache import PixelCache
+        started = time.perf_counter()
+        
         image_path = os.path.join(self.current_directory, self.image_files[self.current_image_index])
-        self.original_image = Image.open(image_path).convert("RGBA")
+        if self.pixel_cache_checkbox.isChecked():
+            self.original_image = PixelCache(self.current_directory).load_image(self.image_files[self.current_image_index])
+        else:
+            self.original_image = Image.open(image_path).convert("RGBA")
+        self.invalidate_render_cache()
         
         # Store original size for reference
         self.original_size = self.original_image.size
         
-        # Only adjust size if needed for effects
+        # The source stays unpadded; with a glow active it is shown at the size the glow gives it
         if self.current_glow != "None":
-            self.adjust_image_size()
-        
-        self.adjusted_image = self.original_image.copy()
+            from ImageEffects import glow_padding
+            padding = glow_padding(self.current_glow, self.border_width_slider.value())
+            self.adjusted_image = self.get_glow_canvas().pad(self.original_image, padding)
+        else:
+            self.adjusted_image = self.original_image.copy()
         self.update_image()
-
-    def adjust_image_size(self):
-        """Adjust image size based on border/glow width"""
-        if not self.original_image or self.current_glow == "None":
-            return
-            
-        border_width = self.border_width_slider.value()
+        self.refresh_gallery()
         
-        self.status_text.append(f"Adjusting image size for {self.current_glow} effect...")
-        self.status_text.repaint()
-        
-        # Use the function from ImageEffects.py
-        self.original_image = adjust_image_size(self.original_image, self.current_glow, border_width)
-        self.adjusted_image = self.original_image.copy()
-        
-        self.status_text.append("Image size adjusted.")
-        self.status_text.repaint()
+        if not self.first_render_logged:
+            self.first_render_logged = True
+            self.status_text.append(f"First image shown in {(time.perf_counter() - started) * 1000:.0f} ms")
 
     def update_image(self):
-        """Update the displayed image without changing layout dimensions"""
+        """Show adjusted_image; only tiles that changed since the last render are redrawn"""
         if self.adjusted_image:
-            # Calculate the available space in the image label
-            label_width = self.image_label.width()
-            label_height = self.image_label.height()
-            
-            if label_width <= 0 or label_height <= 0:
-                return  # Avoid scaling with invalid dimensions
-                
-            # Convert the image to QPixmap
-            qt_image = ImageQt.ImageQt(self.adjusted_image)
-            pixmap = QPixmap.fromImage(qt_image)
-            
-            # Scale the image to fit in the available space while preserving aspect ratio
-            scaled_pixmap = pixmap.scaled(
-                label_width,
-                label_height,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation)
-            
-            # Set the pixmap without changing the label's size
-            self.image_label.setPixmap(scaled_pixmap)
+            if not self.transparency_checkbox.isChecked():
+                background = (255, 255, 255)  # Preview what will be saved
+            elif not self.display_background_as_black:
+                background = (255, 255, 255)
+            else:
+                background = (0, 0, 0)
+            self.image_view.set_background(background)
+            self.image_view.set_image(self.adjusted_image)
 
     def apply_adjustments(self):
         if not self.original_image:
             return
+        import numpy as np
+        from PIL import Image
+        from ImageEffects import apply_color_option, apply_glow_effect, HSVPlanes, is_rgb_only
+        from RenderCache import render_digest, render_key
         
         # Check if letter effects have changed by comparing actual values
         letter_effects_changed = False
@@ -677,7 +985,8 @@ class ColorBalanceApp(QMainWindow):
         if any(self.sliders[key].value() != 0 for key in self.sliders):
             effects.append("Color Adjustments")
         if self.current_effect != "None":
-            effects.append(self.current_effect)
+            from ColorLUT import effect_label
+            effects.append(effect_label(self.current_effect))
         if self.current_glow != "None":
             effects.append(self.current_glow)
             
@@ -689,137 +998,95 @@ class ColorBalanceApp(QMainWindow):
             self.status_text.append("Resetting to original")
         self.status_text.repaint()
         
+        # The same image and settings may have been rendered in an earlier session
+        cache_key = render_key(self.get_input_digest(), render_digest(self.get_effect_parameters()))
+        cached = self.render_cache.get(cache_key)
+        if cached is not None:
+            self.adjusted_image = Image.fromarray(np.array(cached))
+            self.update_image()
+            self.status_text.append("Completed Processing (cached).")
+            self.status_text.repaint()
+            self.update_effects_list()
+            self.refresh_gallery()
+            return
+        
         # Process letter effects only if they've changed
         if letter_effects_changed or self.letter_image is None:
-            # Start with original image for letter effects
-            self.letter_image = self.original_image.copy()
-            
-            # Apply color adjustments and special effects to letter using NumPy
-            if any(self.sliders[key].value() != 0 for key in self.sliders):
-                # Convert image to NumPy array
-                img_array = np.array(self.letter_image)
-                
-                # Get alpha channel
-                alpha = img_array[:, :, 3]
-                
-                # Only process non-transparent pixels
-                mask = alpha > 0
-                
-                if mask.any():  # Only process if there are non-transparent pixels
-                    # Get RGB values and normalize
-                    rgb = img_array[mask, :3].astype(np.float32) / 255.0
-                    
-                    # Calculate HSV
-                    max_val = np.max(rgb, axis=1)
-                    min_val = np.min(rgb, axis=1)
-                    diff = max_val - min_val
-                    
-                    # Calculate Hue
-                    h = np.zeros_like(max_val)
-                    diff_mask = diff != 0
-                    
-                    # Red is maximum
-                    idx = (rgb[:, 0] == max_val) & diff_mask
-                    h[idx] = (rgb[idx, 1] - rgb[idx, 2]) / diff[idx] % 6
-                    
-                    # Green is maximum
-                    idx = (rgb[:, 1] == max_val) & diff_mask
-                    h[idx] = (rgb[idx, 2] - rgb[idx, 0]) / diff[idx] + 2
-                    
-                    # Blue is maximum
-                    idx = (rgb[:, 2] == max_val) & diff_mask
-                    h[idx] = (rgb[idx, 0] - rgb[idx, 1]) / diff[idx] + 4
-                    
-                    h = (h / 6.0 + self.sliders["hue"].value() / 360.0) % 1.0
-                    
-                    # Calculate Saturation and Value
-                    s = np.divide(diff, max_val, out=np.zeros_like(diff), where=max_val!=0)
-                    v = max_val
-                    
-                    # Convert back to RGB
-                    c = v * s
-                    h_prime = h * 6.0
-                    x = c * (1 - np.abs(h_prime % 2 - 1))
-                    m = v - c
-                    
-                    # Initialize output RGB array
-                    rgb_out = np.zeros_like(rgb)
-                    
-                    # Apply RGB conversion based on hue
-                    idx = (h_prime < 1)
-                    rgb_out[idx] = np.column_stack((c[idx], x[idx], np.zeros_like(x[idx])))
-                    
-                    idx = (h_prime >= 1) & (h_prime < 2)
-                    rgb_out[idx] = np.column_stack((x[idx], c[idx], np.zeros_like(x[idx])))
-                    
-                    idx = (h_prime >= 2) & (h_prime < 3)
-                    rgb_out[idx] = np.column_stack((np.zeros_like(x[idx]), c[idx], x[idx]))
-                    
-                    idx = (h_prime >= 3) & (h_prime < 4)
-                    rgb_out[idx] = np.column_stack((np.zeros_like(x[idx]), x[idx], c[idx]))
-                    
-                    idx = (h_prime >= 4) & (h_prime < 5)
-                    rgb_out[idx] = np.column_stack((x[idx], np.zeros_like(x[idx]), c[idx]))
-                    
-                    idx = (h_prime >= 5)
-                    rgb_out[idx] = np.column_stack((c[idx], np.zeros_like(x[idx]), x[idx]))
-                    
-                    # Add back the value offset
-                    rgb_out = (rgb_out + m[:, np.newaxis]) * 255
-                    
-                    # Apply color balance adjustments
-                    cr_offset = (self.sliders["cyan_red"].value() / 100) * 0.5
-                    mg_offset = (self.sliders["magenta_green"].value() / 100) * 0.5
-                    yb_offset = (self.sliders["yellow_blue"].value() / 100) * 0.5
-                    
-                    rgb_out[:, 0] += cr_offset * 255
-                    rgb_out[:, 1] += mg_offset * 255
-                    rgb_out[:, 2] += yb_offset * 255
-                    
-                    # Clip values to valid range
-                    rgb_out = np.clip(rgb_out, 0, 255).astype(np.uint8)
-                    
-                    # Update the image array
-                    img_array[mask, :3] = rgb_out
-                    
-                    # Convert back to PIL Image
-                    self.letter_image = Image.fromarray(img_array)
+            # Start with the color-adjusted letter, reusing the cached HSV planes
+            color_entry = self.get_color_adjusted()
+            self.letter_image = color_entry[0]
             
             # Apply special effect to the color-adjusted letter
             if self.current_effect != "None":
-                self.letter_image = apply_color_option(self.current_effect, self.letter_image)
+                pixels = self.hsv_planes.pixels  # Color stages never change alpha
+                if color_entry[1] is None and not is_rgb_only(self.current_effect):
+                    color_entry[1] = HSVPlanes(self.letter_image, pixels)
+                self.letter_image = apply_color_option(self.current_effect, self.letter_image, color_entry[1], pixels)
             
             # Update current letter effects state with actual values
             for key in self.sliders:
                 self.current_letter_effects["slider_values"][key] = self.sliders[key].value()
             self.current_letter_effects["special_effect"] = self.current_effect
         
-        # Start with current letter state
-        self.adjusted_image = self.letter_image.copy()
-            
         # Apply glow/border as a separate effect with its own color
         if self.current_glow != "None":
-            # Create larger canvas for glow
+            # The letter's opaque pixels are those of the original, placed on a reused padded canvas
             glow_width = self.border_width_slider.value()
-            padding = glow_width * 8 if self.current_glow == "glow" else glow_width * 4
-            
-            # Create new image with padding
-            new_width = self.adjusted_image.width + padding
-            new_height = self.adjusted_image.height + padding
-            final_image = Image.new('RGBA', (new_width, new_height), (0, 0, 0, 0))
-            
-            # Paste the letter image in center
-            paste_x = padding // 2
-            paste_y = padding // 2
-            final_image.paste(self.adjusted_image, (paste_x, paste_y))
-            
-            # Apply glow/border effect with its own color
-            self.adjusted_image = apply_glow_effect(self.current_glow, final_image, self.start_color_slider, self.border_width_slider)
+            self.adjusted_image = apply_glow_effect(self.current_glow, self.letter_image, self.start_color_slider.value(),
+                                                    glow_width, self.hsv_planes.pixels, self.get_glow_canvas())
+        else:
+            self.adjusted_image = self.letter_image.copy()
         
+        self.render_cache_writer.submit(self.render_cache.put, cache_key, np.asarray(self.adjusted_image))
         self.update_image()
         self.status_text.append("Completed Processing.")
         self.status_text.repaint()
         self.update_effects_list()
+        self.refresh_gallery()
+
+    def get_color_adjusted(self):
+        """Return [slider-adjusted letter, its HSVPlanes or None], cached per loaded image"""
+        from ImageEffects import apply_color_adjustments, HSVPlanes
+        slider_values = tuple(self.sliders[key].value() for key in sorted(self.sliders))
+        if self.color_cache and self.color_cache[0] == slider_values:
+            return self.color_cache[1]
+            
+        # The original image is decomposed once, later slider moves only run HSV to RGB
+        if self.hsv_planes is None:
+            self.hsv_planes = HSVPlanes(self.original_image)
+            
+        if any(slider_values):
+            color_entry = [apply_color_adjustments(self.original_image, *self.get_slider_offsets(), planes=self.hsv_planes), None]
+        else:
+            color_entry = [self.original_image, self.hsv_planes]
+        self.color_cache = (slider_values, color_entry)
+        return color_entry
+
+    def get_input_digest(self):
+        """Digest of the current image file, computed once per loaded image
+
+        Batch conversion and the render server key renders by the same file
+        digest, so all of them share render cache entries.
+        """
+        from BatchManifest import file_digest
+        if self.input_digest is None:
+            self.input_digest = file_digest(os.path.join(self.current_directory,
+                                                         self.image_files[self.current_image_index]))
+        return self.input_digest
+
+    def get_glow_canvas(self):
+        """Return the reused padded canvas, created on first use"""
+        if self.glow_canvas is None:
+            from ImageEffects import PaddedCanvas
+            self.glow_canvas = PaddedCanvas(reuse=True)
+        return self.glow_canvas
+
+    def invalidate_render_cache(self):
+        """Drop everything derived from original_image"""
+        self.hsv_planes = None
+        self.color_cache = None
+        self.input_digest = None
+        self.letter_image = None
 
     def reset_adjustments(self):
         if self.original_image:
@@ -864,9 +1131,69 @@ class ColorBalanceApp(QMainWindow):
         if file_path:
             if not file_path.lower().endswith('.png'):
                 file_path += '.png'
+            from ImageEffects import save_image_with_transparency
             save_image_with_transparency(self.adjusted_image, file_path, self.transparency_checkbox.isChecked())
             self.status_text.append(f"Image saved: {os.path.basename(file_path)}")
 
+    def get_output_options(self):
+        """Output format, transparency and PNG options as convert_files keyword arguments"""
+        level = self.png_level_combo.currentText()
+        strategy = self.png_strategy_combo.currentText()
+        return {
+            "output_format": self.output_format_combo.currentText(),
+            "transparency": self.transparency_checkbox.isChecked(),
+            "compress_level": None if level == "Auto" else int(level),
+            "strategy": None if strategy == "Auto" else strategy
+        }
+
+    def save_settings(self):
+        """Save the effect parameters and output options as a settings file"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Settings",
+            self.current_directory if self.current_directory else "",
+            "AnyColor settings (*.json)"
+        )
+        if not file_path:
+            return
+        if not file_path.lower().endswith('.json'):
+            file_path += '.json'
+        from BatchConvert import save_settings
+        try:
+            save_settings(file_path, self.get_effect_parameters(), **self.get_output_options())
+        except OSError as e:
+            self.status_text.append(f"Error saving settings: {e}")
+            return
+        self.status_text.append(f"Settings saved: {os.path.basename(file_path)}")
+
+    def save_job(self):
+        """Save converting the loaded directory with the current effects as a job-spec file"""
+        if not self.current_directory:
+            self.status_text.append("Error: Please load a directory first")
+            return
+        directory_name, ok = QInputDialog.getText(self, "New Directory Name", "Enter name for output directory:")
+        if not ok or not directory_name:
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Job",
+            os.path.join(self.current_directory, f"{directory_name}.job.json"),
+            "AnyColor jobs (*.json)"
+        )
+        if not file_path:
+            return
+        if not file_path.lower().endswith('.json'):
+            file_path += '.json'
+        from BatchJob import save_job
+        try:
+            save_job(file_path, self.current_directory,
+                     [(self.get_output_path(directory_name), self.get_effect_parameters())],
+                     **self.get_output_options(), pattern=self.file_pattern_edit.text(), recursive=self.recursive_checkbox.isChecked())
+        except OSError as e:
+            self.status_text.append(f"Error saving job: {e}")
+            return
+        self.status_text.append(f"Job saved: {os.path.basename(file_path)}, run it with BatchJob.py")
+
     def convert_directory(self):
         if not self.current_directory:
             self.status_text.append("Error: Please load a directory first")
@@ -886,7 +1213,10 @@ class ColorBalanceApp(QMainWindow):
             adjustments.append(f"Hue rotation: {self.sliders['hue'].value()}°")
         selected_option = self.current_effect
         if selected_option != "None":
-            adjustments.append(f"Color Option: {selected_option}")
+            from ColorLUT import effect_label
+            adjustments.append(f"Color Option: {effect_label(selected_option)}")
+        if self.current_glow != "None":
+            adjustments.append(f"{self.current_glow.title()}: width {self.border_width_slider.value()}, hue {self.start_color_slider.value()}°")
         adjustments_text = "Current adjustments to be applied:\n" + "\n".join(adjustments) if adjustments else "No adjustments to be applied"
         dialog.setLabelText(f"{adjustments_text}\n\nEnter name for output directory:")
         dialog.resize(dialog.width() * 2, dialog.height() * 2)
@@ -894,52 +1224,148 @@ class ColorBalanceApp(QMainWindow):
         if not dialog.exec() or not dialog.textValue():
             return
         directory_name = dialog.textValue()
-        onedrive_path = os.path.expanduser("~/OneDrive")
-        output_path = os.path.join(onedrive_path, "VectorProgram", "Scripts", "Alphabet Scripts", "Alphabets", directory_name)
+        output_path = self.get_output_path(directory_name)
+        self.status_text.append(f"Output directory: {directory_name}")
+        self.run_conversion([(output_path, self.get_effect_parameters())])
+
+    def import_lut(self):
+        """Apply a .cube 3D LUT file as the special effect"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import LUT",
+            self.current_directory if self.current_directory else "",
+            "3D LUT (*.cube)"
+        )
+        if not file_path:
+            return
+        from ColorLUT import load_lut, lut_effect
         try:
-            os.makedirs(output_path, exist_ok=True)
-            self.status_text.append(f"Created output directory: {directory_name}")
-            self.status_text.repaint()
-            cr_offset = (self.sliders["cyan_red"].value() / 100) * 0.5
-            mg_offset = (self.sliders["magenta_green"].value() / 100) * 0.5
-            yb_offset = (self.sliders["yellow_blue"].value() / 100) * 0.5
-            hue_offset = self.sliders["hue"].value() / 360.0
-            for image_file in self.image_files:
-                input_path = os.path.join(self.current_directory, image_file)
-                output_file = os.path.join(output_path, image_file)
-                img = Image.open(input_path).convert("RGBA")
-                pixels = img.load()
-                width, height = img.size
-                for j in range(height):
-                    for i in range(width):
-                        r, g, b, a = pixels[i, j]
-                        pixels[i, j] = self.adjust_pixel(r, g, b, a, cr_offset, mg_offset, yb_offset, hue_offset)
-                self.adjusted_image = img.copy()
-                self.background_color = self.background_color
-                if selected_option != "None":
-                    self.apply_color_option(selected_option)
-                    img = self.adjusted_image
-                if self.negative_applied:
-                    for j in range(height):
-                        for i in range(width):
-                            r, g, b, a = pixels[i, j]
-                            if a == 0:
-                                continue
-                            pixels[i, j] = (255 - r, 255 - g, 255 - b, a)
-                    self.background_color = (255 - self.background_color[0], 255 - self.background_color[1], 255 - self.background_color[2])
-                self.save_image_with_transparency(img, output_file, self.transparency_checkbox.isChecked())
+            lut = load_lut(file_path)
+        except (OSError, ValueError) as e:
+            self.status_text.append(f"Error importing LUT: {e}")
+            return
+        self.select_effect(lut_effect(file_path))
+        self.status_text.append(f"Imported {lut.size}-point LUT: {os.path.basename(file_path)}")
+
+    def export_lut(self):
+        """Save the color sliders and special effect as a .cube 3D LUT"""
+        from ImageEffects import POSITIONAL_EFFECTS
+        parameters = self.get_effect_parameters()
+        if parameters["effect"] in POSITIONAL_EFFECTS:
+            self.status_text.append(f"Error: {parameters['effect']} depends on pixel position and cannot be exported as a LUT")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export LUT",
+            self.current_directory if self.current_directory else "",
+            "3D LUT (*.cube)"
+        )
+        if not file_path:
+            return
+        if not file_path.lower().endswith('.cube'):
+            file_path += '.cube'
+        from ImageEffects import pipeline_lut
+        try:
+            pipeline_lut(parameters).write(file_path)
+        except OSError as e:
+            self.status_text.append(f"Error saving LUT: {e}")
+            return
+        self.status_text.append(f"LUT saved: {os.path.basename(file_path)}")
+
+    def get_output_path(self, directory_name):
+        """Return the full path of an output directory in the alphabets folder"""
+        onedrive_path = os.path.expanduser("~/OneDrive")
+        return os.path.join(onedrive_path, "VectorProgram", "Scripts", "Alphabet Scripts", "Alphabets", directory_name)
+
+    def run_conversion(self, variants):
+        """Convert the loaded directory into each (output_dir, parameters) variant"""
+        from BatchConvert import convert_files
+        from DirectoryScanner import iter_files, parse_patterns
+        
+        def report(image_file, rendered):
+            if rendered:
                 self.status_text.append(f"Processed: {image_file}")
-                self.status_text.repaint()
-                QApplication.processEvents()
+            self.status_text.repaint()
+            QApplication.processEvents()
+
+        def report_schedule(lines):
+            for line in lines:
+                self.status_text.append(line)
+
+        # While the directory is still being listed, convert from an unsorted listing of its own,
+        # which hands on names as they are read instead of once each directory is sorted
+        if self.listing_drained:
+            image_files = self.image_files
+        else:
+            image_files = iter_files(self.current_directory, parse_patterns(self.file_pattern_edit.text()),
+                                     self.recursive_checkbox.isChecked(), sort=False)
+        try:
+            processed, skipped, errors = convert_files(
+                self.current_directory, image_files, variants, **self.get_output_options(),
+                progress=report, report=report_schedule,
+                pixel_cache=self.pixel_cache_checkbox.isChecked(),
+                render_cache=self.render_cache)
+            for file_path, error in errors:
+                self.status_text.append(f"Error writing {os.path.basename(file_path)}: {str(error)}")
+            if skipped:
+                self.status_text.append(f"Skipped {skipped} unchanged outputs")
             self.status_text.append("Directory conversion complete!")
             self.status_text.repaint()
         except Exception as e:
             self.status_text.append(f"Error: {str(e)}")
             self.status_text.repaint()
 
-    def toggle_background(self):
-        if not self.image_label:
+    def export_all_effects(self):
+        """Convert the directory into one output directory per selected effect and glow variant"""
+        if not self.current_directory:
+            self.status_text.append("Error: Please load a directory first")
             return
+            
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Export All Effects")
+        dialog_layout = QVBoxLayout(dialog)
+        dialog_layout.addWidget(QLabel("Special effects:"))
+        effect_list = QListWidget()
+        for effect in self.available_effects:
+            item = QListWidgetItem(effect)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Unchecked if effect == "None" else Qt.CheckState.Checked)
+            effect_list.addItem(item)
+        dialog_layout.addWidget(effect_list)
+        
+        dialog_layout.addWidget(QLabel("Glow/Border variants (current width and color):"))
+        glow_checkboxes = {}
+        for glow_type, label in [("None", "No glow/border"), ("glow", "Glow"), ("border", "Border")]:
+            checkbox = QCheckBox(label)
+            checkbox.setChecked(glow_type == self.current_glow)
+            glow_checkboxes[glow_type] = checkbox
+            dialog_layout.addWidget(checkbox)
+            
+        dialog_layout.addWidget(QLabel("Output directory name (one subdirectory per variant):"))
+        name_edit = QLineEdit()
+        dialog_layout.addWidget(name_edit)
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        dialog_layout.addWidget(buttons)
+        dialog.setFont(self.font())
+        if not dialog.exec() or not name_edit.text():
+            return
+            
+        effects = [effect_list.item(i).text() for i in range(effect_list.count())
+                   if effect_list.item(i).checkState() == Qt.CheckState.Checked]
+        glow_types = [glow_type for glow_type, checkbox in glow_checkboxes.items() if checkbox.isChecked()]
+        if not effects or not glow_types:
+            self.status_text.append("Error: Select at least one effect and one glow/border variant")
+            return
+            
+        from BatchConvert import make_variants
+        variants = make_variants(self.get_effect_parameters(), effects, glow_types,
+                                 self.get_output_path(name_edit.text()))
+        self.status_text.append(f"Exporting {len(variants)} variants of {len(self.image_files)} images")
+        self.run_conversion(variants)
+
+    def toggle_background(self):
         self.display_background_as_black = not self.display_background_as_black
         self.update_image()
 
@@ -969,7 +1395,8 @@ class ColorBalanceApp(QMainWindow):
         
         # Check special effects
         if self.current_effect != "None":
-            effects["Special Effects"].append(self.current_effect)
+            from ColorLUT import effect_label
+            effects["Special Effects"].append(effect_label(self.current_effect))
         
         # Check glow/border effects – record effect type, width, and resize padding details
         if self.current_glow in ["glow", "border"]:  # Check for specific effect types
@@ -1040,6 +1467,7 @@ class ColorBalanceApp(QMainWindow):
         gradient_direction = self.gradient_direction.currentText()
         
         # Use the function from ImageEffects.py
+        from ImageEffects import get_gradient_colors
         return get_gradient_colors(x, y, width, height, start_hue, end_hue, gradient_type, gradient_direction)
 
     def toggle_color_mode(self, state):
@@ -1057,21 +1485,6 @@ class ColorBalanceApp(QMainWindow):
         if self.glow_button.isChecked() or self.border_button.isChecked():
             self.apply_adjustments()
 
-    def adjust_size_for_glow(self):
-        """Adjust image size for glow using the current adjusted image"""
-        if not self.adjusted_image:
-            return
-        
-        border_width = self.border_width_slider.value()
-        self.status_text.append(f"Adjusting image size for {self.current_glow} effect...")
-        self.status_text.repaint()
-        
-        # Use the function from ImageEffects.py
-        self.adjusted_image = adjust_size_for_glow(self.adjusted_image, self.current_glow, border_width)
-        
-        self.status_text.append("Image size adjusted.")
-        self.status_text.repaint()
-
     def handle_glow_click(self, effect_type):
         """Handle glow/border button click"""
         # Update current glow type
@@ -0,0 +1,372 @@
+"""
+BatchConvert.py - Directory conversion into one or more effect variants
+"""
+
+import copy
+import json
+import os
+import threading
+import numpy as np
+from PIL import Image
+from ImageEffects import output_file_name, OUTPUT_FORMATS, PNG_STRATEGIES, SLIDER_KEYS, GLOW_TYPES
+from ImageWriter import BackgroundImageWriter
+from BatchManifest import BatchManifest, parameters_digest
+from BatchStack import render_stack, stack_batch_size, frame_memory
+from BatchScheduler import plan_schedule, schedule_report, default_memory_budget, format_bytes, MemoryBudget
+from Pipeline import Stage, StageFailure, run_pipeline
+from SharedImages import SharedRenderPool
+from PixelCache import PixelCache
+from RenderCache import render_digest, render_key
+
+# Thread pool sizes: decoding and writing wait on disk and zlib, rendering on NumPy
+IO_WORKERS = 2
+CPU_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+SETTINGS_VERSION = 1
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_parameters(parameters):
+    """Raise ValueError unless parameters is a complete effect parameter set with values of the right types
+
+    Catches bad job specs, settings files and render requests before
+    anything is decoded, instead of failing inside the render.
+    """
+    if not isinstance(parameters, dict):
+        raise ValueError("Effect parameters must be a JSON object")
+    for key in ("sliders", "effect", "glow"):
+        if key not in parameters:
+            raise ValueError(f"Effect parameters have no {key} settings")
+
+    sliders = parameters["sliders"]
+    if not isinstance(sliders, dict) or set(sliders) != set(SLIDER_KEYS):
+        raise ValueError(f"Effect sliders must be exactly {', '.join(SLIDER_KEYS)}")
+    for key, value in sliders.items():
+        if not _is_number(value):
+            raise ValueError(f"Slider {key} must be a number")
+    if not isinstance(parameters["effect"], str):
+        raise ValueError("The effect must be a name")
+
+    glow = parameters["glow"]
+    if not isinstance(glow, dict) or glow.get("type") not in GLOW_TYPES:
+        raise ValueError(f"The glow type must be one of {', '.join(GLOW_TYPES)}")
+    if glow["type"] == "None":
+        return
+    width = glow.get("width")
+    if not isinstance(width, int) or isinstance(width, bool) or width < 0:
+        raise ValueError("The glow width must be a whole number of pixels, 0 or more")
+    for key in ("start_hue", "end_hue"):
+        if not _is_number(glow.get(key)):
+            raise ValueError(f"The glow {key} must be a number")
+    if not isinstance(glow.get("double_color", False), bool):
+        raise ValueError("The glow double_color must be true or false")
+
+
+def output_section(output_format="PNG", transparency=True, compress_level=None, strategy=None):
+    """The "output" section of settings and job files; PNG options are left out when unset"""
+    output = {"format": output_format, "transparency": transparency}
+    if compress_level is not None:
+        output["compress_level"] = compress_level
+    if strategy is not None:
+        output["strategy"] = strategy
+    return output
+
+
+def output_options(output):
+    """convert_files keyword arguments from an "output" section, raising ValueError on bad values"""
+    options = {
+        "output_format": output.get("format", "PNG"),
+        "transparency": output.get("transparency", True),
+        "compress_level": output.get("compress_level"),
+        "strategy": output.get("strategy")
+    }
+    if options["output_format"] not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {options['output_format']}")
+    if options["compress_level"] is not None and options["compress_level"] not in range(10):
+        raise ValueError("PNG compress_level must be 0 to 9")
+    if options["strategy"] is not None and options["strategy"] not in PNG_STRATEGIES:
+        raise ValueError(f"Unknown PNG strategy {options['strategy']}")
+    return options
+
+
+def save_settings(path, parameters, output_format="PNG", transparency=True, compress_level=None, strategy=None):
+    """Write an effect parameter set and its output options as a JSON settings file"""
+    data = {
+        "version": SETTINGS_VERSION,
+        "parameters": parameters,
+        "output": output_section(output_format, transparency, compress_level, strategy)
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+def load_settings(path):
+    """Read a settings file as (parameters, output options as convert_files keyword arguments)"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != SETTINGS_VERSION:
+        raise ValueError(f"{os.path.basename(path)} is not an AnyColor settings file")
+    parameters = data["parameters"]
+    check_parameters(parameters)
+    return parameters, output_options(data.get("output", {}))
+
+
+def variant_name(effect, glow_type):
+    """Directory name for an effect / glow combination"""
+    name = effect
+    if glow_type != "None":
+        name += f" + {glow_type.title()}"
+    return name
+
+
+def make_variants(parameters, effects, glow_types, output_root):
+    """Fan the base parameter set out into (output_dir, parameters) pairs"""
+    variants = []
+    for effect in effects:
+        for glow_type in glow_types:
+            variant = copy.deepcopy(parameters)
+            variant["effect"] = effect
+            variant["glow"]["type"] = glow_type
+            variants.append((os.path.join(output_root, variant_name(effect, glow_type)), variant))
+    return variants
+
+
+def convert_files(input_dir, image_files, variants, output_format="PNG", transparency=True,
+                  progress=None, memory_budget=None, io_workers=IO_WORKERS,
+                  cpu_workers=CPU_WORKERS, processes=0, report=None, pixel_cache=False,
+                  render_cache=None, render_pool=None, compress_level=None, strategy=None,
+                  manifests=None, writer=None):
+    """Convert image_files into every variant, decoding and color-analysing each input once
+
+    variants is a list of (output_dir, parameters). Outputs whose input and
+    parameters match the output directory's manifest are skipped, and renders
+    found in render_cache are written without rendering. Inputs run largest
+    first, and a render only starts while the estimated peak memory of
+    everything rendering fits memory_budget (default: half the physical
+    memory). Consecutive same-sized inputs are rendered together as one stack.
+
+    Checking, decoding, rendering and writing run as a streaming pipeline on
+    separate thread pools; with processes > 0 rendering runs in that many
+    worker processes, exchanging pixels through shared memory. Callers that
+    convert repeatedly can pass their own SharedRenderPool as render_pool to
+    keep its workers warm; it is left open. With pixel_cache, decoded pixels
+    are kept in a PixelCache next to the inputs so later runs skip
+    decompression; pixel_cache may also be the PixelCache to use.
+    compress_level and strategy override the PNG formats' zlib level and
+    strategy (see PNG_STRATEGIES).
+
+    Callers converting into the same variants again and again can likewise
+    keep their own BatchManifest per variant (manifests) and a
+    BackgroundImageWriter made with the same output options (writer). Both
+    are left open, and the manifests are updated but not saved, so the
+    caller decides when to write them.
+
+    image_files may also be an iterator, such as a directory listing still in
+    progress; its files are then converted in the order they arrive instead
+    of largest first, starting with the first one.
+
+    report, if given, is called with the schedule's description lines before
+    rendering starts. progress, if given, is called on the calling thread with
+    (image_file, rendered_count) for every rendered input.
+    Returns (processed, skipped, errors).
+    """
+    own_manifests = manifests is None
+    if own_manifests:
+        manifests = [BatchManifest(output_dir) for output_dir, _ in variants]
+    # Everything that affects the output bytes decides whether a file is up to date
+    output_settings = output_section(output_format, transparency, compress_level, strategy)
+    recorded_sets = []
+    for manifest, (_, parameters) in zip(manifests, variants):
+        recorded = dict(parameters, output=output_settings)
+        # Digested once per variant rather than for every file; LUT effects also hash their .cube file
+        recorded_sets.append((manifest, recorded, parameters_digest(recorded)))
+    manifests = recorded_sets
+    for output_dir, _ in variants:
+        os.makedirs(output_dir, exist_ok=True)
+    if render_cache:
+        render_digests = [render_digest(parameters) for _, parameters in variants]
+
+    if memory_budget is None:
+        memory_budget = default_memory_budget()
+    if render_pool:
+        cpu_workers = render_pool.processes
+    elif processes:
+        cpu_workers = processes
+    if isinstance(image_files, (list, tuple)):
+        jobs = plan_schedule(input_dir, image_files, [parameters for _, parameters in variants])
+        if report:
+            report(schedule_report(jobs, memory_budget, cpu_workers))
+        source = [job["file"] for job in jobs]
+    else:
+        # The files are not all known yet, so they run as listed; admission still bounds memory
+        if report:
+            report([f"Converting images as they are listed under a {format_bytes(memory_budget)} memory budget"])
+        source = image_files
+    admission = MemoryBudget(memory_budget)
+
+    skipped = [0]
+    skipped_lock = threading.Lock()
+    errors = []
+
+    def check(image_file):
+        # Work out which variants are stale before decoding anything
+        input_path = os.path.join(input_dir, image_file)
+        output_name = output_file_name(image_file, output_format)
+        input_state = manifests[0][0].input_state(output_name, input_path)
+        todo = tuple(index for index, (manifest, _, recorded_key) in enumerate(manifests)
+                     if not manifest.is_current(output_name, input_state, recorded_key))
+        with skipped_lock:
+            skipped[0] += len(variants) - len(todo)
+        if not todo:
+            return
+        # Files listed from subdirectories are written to the same subdirectories
+        if os.path.dirname(output_name):
+            for index in todo:
+                os.makedirs(os.path.join(variants[index][0], os.path.dirname(output_name)), exist_ok=True)
+
+        # Renders cached by an earlier run with the same input and parameters
+        keys, cached = {}, {}
+        if render_cache:
+            for index in todo:
+                keys[index] = render_key(input_state["input_hash"], render_digests[index])
+                pixels = render_cache.get(keys[index])
+                if pixels is not None:
+                    cached[index] = pixels
+            todo = tuple(index for index in todo if index not in cached)
+        yield {"file": image_file, "input_path": input_path, "output_name": output_name,
+               "input_state": input_state, "todo": todo, "keys": keys, "cached": cached}
+
+    if isinstance(pixel_cache, PixelCache):
+        cache = pixel_cache
+    else:
+        cache = PixelCache(input_dir) if pixel_cache else None
+
+    def decode(job):
+        if not job["todo"]:
+            pass  # Every stale output is cached
+        elif cache:
+            job["pixels"] = cache.load(job["file"])
+        else:
+            with Image.open(job["input_path"]) as image:
+                job["pixels"] = np.asarray(image.convert("RGBA"))
+        yield job
+
+    # Each render worker holds its own stack, so they share the memory budget
+    stack_budget = memory_budget // max(1, cpu_workers)
+    stacker = StackGrouper(variants, stack_budget)
+    own_pool = render_pool is None and processes > 0
+    if own_pool:
+        render_pool = SharedRenderPool(processes)
+
+    def render(group):
+        if not group[0]["todo"]:
+            yield group, []
+            return
+        frames = [job["pixels"] for job in group]
+        parameter_sets = [variants[index][1] for index in group[0]["todo"]]
+        height, width = frames[0].shape[:2]
+        with admission.admit(frame_memory(width, height, parameter_sets) * len(frames)):
+            if render_pool:
+                results = render_pool.render(frames, parameter_sets)
+            else:
+                results = render_stack(np.stack(frames), parameter_sets)
+        if render_cache:
+            for index, result in zip(group[0]["todo"], results):
+                for frame, job in zip(result, group):
+                    render_cache.put(job["keys"][index], frame)
+        yield group, results
+
+    stages = [
+        Stage("check", check, io_workers),
+        Stage("decode", decode, io_workers),
+        Stage("stack", stacker.add, 1, flush=stacker.flush),
+        Stage("render", render, cpu_workers)
+    ]
+
+    pending = {}
+    processed = 0
+    # The writer pool encodes and writes while the pipeline renders the next stacks
+    own_writer = writer is None
+    if own_writer:
+        writer = BackgroundImageWriter(max_workers=io_workers, output_format=output_format,
+                                       compress_level=compress_level, strategy=strategy)
+    try:
+        for output in run_pipeline(source, stages):
+            if isinstance(output, StageFailure):
+                for failed in failed_paths(input_dir, output.item):
+                    errors.append((failed, output.error))
+                continue
+            group, results = output
+            todo = group[0]["todo"]
+            outputs = [(index, frame, job) for index, result in zip(todo, results)
+                       for frame, job in zip(result, group)]
+            outputs += [(index, pixels, job) for job in group for index, pixels in job["cached"].items()]
+            for index, frame, job in outputs:
+                output_file = os.path.join(variants[index][0], job["output_name"])
+                pending[output_file] = (index, job)
+                writer.submit(Image.fromarray(frame), output_file, transparency)
+            processed += len(outputs)
+            if progress:
+                for job in group:
+                    progress(job["file"], len(todo) + len(job["cached"]))
+    finally:
+        # A writer kept by the caller must not carry this run's results into the next one
+        written, write_errors = writer.flush()
+        if own_writer:
+            writer.close()
+        if own_pool:
+            render_pool.close()
+
+    # Only outputs that were actually written go into the manifests
+    for output_file in written:
+        index, job = pending[output_file]
+        manifest, recorded, recorded_key = manifests[index]
+        manifest.record(job["output_name"], job["input_path"], job["input_state"], recorded, recorded_key)
+    if own_manifests:
+        for manifest, _, _ in manifests:
+            manifest.save()
+
+    return processed, skipped[0], errors + write_errors
+
+
+def failed_paths(input_dir, item):
+    """Input paths behind a failed pipeline item: a file name, a job or a stack of jobs"""
+    if isinstance(item, str):
+        return [os.path.join(input_dir, item)]
+    if isinstance(item, dict):
+        return [item["input_path"]]
+    if isinstance(item, list):
+        return [job["input_path"] for job in item]
+    return [input_dir]
+
+
+class StackGrouper:
+    """Pipeline stage that collects decoded jobs into same-sized stacks"""
+    def __init__(self, variants, memory_budget):
+        self.variants = variants
+        self.memory_budget = memory_budget
+        self.group = []
+        self.key = None
+        self.limit = 1
+
+    def add(self, job):
+        if not job["todo"]:
+            yield [job]  # Nothing to render, pass it straight on
+            return
+        # Start a new stack when the size or the stale variants differ, or it is full
+        key = (job["pixels"].shape, job["todo"])
+        if self.group and (key != self.key or len(self.group) >= self.limit):
+            yield from self.flush()
+        if not self.group:
+            self.key = key
+            height, width = job["pixels"].shape[:2]
+            self.limit = stack_batch_size(width, height, [self.variants[index][1] for index in job["todo"]],
+                                          self.memory_budget)
+        self.group.append(job)
+
+    def flush(self):
+        if self.group:
+            group, self.group = self.group, []
+            yield group
@@ -0,0 +1,302 @@
+"""
+BatchJob.py - Resumable batch conversions described by job-spec files
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from BatchConvert import convert_files, check_parameters, load_settings, output_options, output_section
+from DirectoryScanner import iter_files, parse_patterns
+from ImageEffects import output_file_name
+from RenderCache import RenderCache
+from SharedImages import SharedRenderPool
+
+JOB_VERSION = 1
+DEFAULT_RETRIES = 2
+# Files converted between journal checkpoints; an interruption redoes at most this many
+CHECKPOINT_FILES = 64
+
+
+class JobSpec:
+    """Inputs, output variants and options of a batch job
+
+    A job-spec file is JSON:
+        {"version": 1,
+         "input_dir": "Alphabet",
+         "files": ["image1.png", ...],             (optional, default: every file matching pattern)
+         "pattern": "image*.png; *.jpg",
+         "recursive": false,                     (include files in subdirectories)
+         "variants": [{"output_dir": "Alphabet_neon", "parameters": {...}},
+                      {"output_dir": "Alphabet_grade", "settings": "grade.json"}],
+         "output": {"format": "PNG", "transparency": true,
+                    "compress_level": 6, "strategy": "RLE"},  (PNG options, optional)
+         "retries": 2, "processes": 0, "pixel_cache": false}
+    Relative paths are relative to the job-spec file. A variant either holds
+    its effect parameters or names a settings file saved from AnyColor.
+    """
+    def __init__(self, input_dir, variants, files=None, pattern="image*.png", output_format="PNG",
+                 transparency=True, retries=DEFAULT_RETRIES, processes=0, pixel_cache=False,
+                 recursive=False, compress_level=None, strategy=None):
+        # Raises ValueError for an unknown format or out-of-range PNG options
+        output_options(output_section(output_format, transparency, compress_level, strategy))
+        for _, parameters in variants:
+            check_parameters(parameters)
+        self.input_dir = input_dir
+        self.variants = variants
+        self.files = files
+        self.pattern = pattern
+        self.recursive = recursive
+        self.output_format = output_format
+        self.transparency = transparency
+        self.compress_level = compress_level
+        self.strategy = strategy
+        self.retries = retries
+        self.processes = processes
+        self.pixel_cache = pixel_cache
+
+    @classmethod
+    def load(cls, path):
+        """Read a job-spec file"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != JOB_VERSION:
+            raise ValueError(f"{os.path.basename(path)} is not an AnyColor job-spec file")
+        base = os.path.dirname(os.path.abspath(path))
+        def resolve(name):
+            return os.path.join(base, os.path.expanduser(name))
+
+        variants = []
+        for variant in data["variants"]:
+            if "settings" in variant:
+                parameters = load_settings(resolve(variant["settings"]))[0]
+            else:
+                parameters = variant["parameters"]
+            variants.append((resolve(variant["output_dir"]), parameters))
+        output = output_options(data.get("output", {}))
+        return cls(resolve(data["input_dir"]), variants, data.get("files"),
+                   data.get("pattern", "image*.png"), output["output_format"],
+                   output["transparency"], data.get("retries", DEFAULT_RETRIES),
+                   data.get("processes", 0), data.get("pixel_cache", False),
+                   data.get("recursive", False), output["compress_level"], output["strategy"])
+
+    def input_files(self):
+        """Iterate over the job's input file names, as they are listed"""
+        if self.files is not None:
+            return iter(self.files)
+        # Order does not matter to a job, so the listing is not sorted and conversion starts at once
+        return iter_files(self.input_dir, parse_patterns(self.pattern), self.recursive, sort=False)
+
+    def digest(self):
+        """Digest of everything that decides the outputs; a journal is only resumed for the same job"""
+        encoded = json.dumps([os.path.abspath(self.input_dir), self.variants, self.output()], sort_keys=True)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def output(self):
+        """The job's "output" section"""
+        return output_section(self.output_format, self.transparency, self.compress_level, self.strategy)
+
+
+def save_job(path, input_dir, variants, output_format="PNG", transparency=True, files=None,
+             pattern="image*.png", recursive=False, retries=DEFAULT_RETRIES, compress_level=None, strategy=None):
+    """Write a job-spec file converting input_dir into (output_dir, parameters) variants
+
+    Without a files list the job converts whatever matches pattern when it runs.
+    """
+    data = {
+        "version": JOB_VERSION,
+        "input_dir": os.path.abspath(input_dir),
+        "pattern": pattern,
+        "recursive": recursive,
+        "variants": [{"output_dir": os.path.abspath(output_dir), "parameters": parameters}
+                     for output_dir, parameters in variants],
+        "output": output_section(output_format, transparency, compress_level, strategy),
+        "retries": retries
+    }
+    if files is not None:
+        data["files"] = list(files)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+
+class JobJournal:
+    """Append-only record of finished and failed files, so an interrupted job resumes where it stopped
+
+    One JSON object per line; the first line names the job the journal
+    belongs to, and a later line for a file replaces earlier ones.
+    """
+    def __init__(self, path, job_digest, restart=False):
+        self.path = path
+        self.entries = {}
+        if not restart and self._belongs_to(job_digest):
+            self.load()
+        else:
+            # A new job, or the spec changed since the journal was written
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"job": job_digest}) + "\n")
+        self.file = open(self.path, "a", encoding="utf-8")
+        self._end_torn_line()
+
+    def _end_torn_line(self):
+        # A line cut off mid-write would swallow the next record, so finish it first
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+        if torn:
+            self.file.write("\n")
+
+    def _belongs_to(self, job_digest):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.loads(f.readline()).get("job") == job_digest
+        except (OSError, ValueError):
+            return False
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Cut off by an interruption mid-write
+                self.entries[entry["file"]] = entry
+
+    def is_done(self, file_name, state):
+        """True if the file was converted in its current (mtime_ns, size) state"""
+        entry = self.entries.get(file_name)
+        return bool(entry) and entry["status"] == "done" and entry["state"] == state
+
+    def has_failed(self, file_name, state):
+        entry = self.entries.get(file_name)
+        return bool(entry) and entry["status"] == "failed" and entry["state"] == state
+
+    def record(self, file_name, status, state, error=None, attempts=1):
+        entry = {"file": file_name, "status": status, "state": state, "attempts": attempts}
+        if error is not None:
+            entry["error"] = error
+        self.entries[file_name] = entry
+        self.file.write(json.dumps(entry) + "\n")
+
+    def checkpoint(self):
+        """Make everything recorded so far survive a crash"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.checkpoint()
+        self.file.close()
+
+
+def file_state(path):
+    """(mtime_ns, size) of a file as a list, the way the journal stores it, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def input_name(path, spec, inputs_by_output):
+    """Input file name behind an error path, which names either the input or one of its outputs"""
+    for output_dir, _ in spec.variants:
+        name = inputs_by_output.get(os.path.relpath(path, output_dir))
+        if name:
+            return name
+    return os.path.relpath(path, spec.input_dir)
+
+
+def run_job(spec, journal, retry_failed=False, render_cache=None, log=print):
+    """Convert the files of a job that the journal does not have as done
+
+    Files are converted CHECKPOINT_FILES at a time as the input directory is
+    listed, with the journal made durable after each group. A file that fails
+    is retried up to spec.retries times and then recorded as failed; the rest
+    of the batch carries on. Files recorded as failed are skipped on later
+    runs unless retry_failed is set or they have changed. With spec.processes,
+    one pool of render processes serves every group and retry. Returns (done,
+    failed) counts for this run.
+    """
+    render_pool = SharedRenderPool(spec.processes) if spec.processes > 0 else None
+    try:
+        return _run_chunks(spec, journal, retry_failed, render_cache, render_pool, log)
+    finally:
+        if render_pool:
+            render_pool.close()
+
+
+def _run_chunks(spec, journal, retry_failed, render_cache, render_pool, log):
+    files = spec.input_files()
+    done = failed = passed = converted = 0
+    while True:
+        chunk = []
+        states = {}
+        # Take the next CHECKPOINT_FILES files that still need converting
+        for name in files:
+            state = file_state(os.path.join(spec.input_dir, name))
+            if journal.is_done(name, state) or (not retry_failed and journal.has_failed(name, state)):
+                passed += 1
+                continue
+            chunk.append(name)
+            states[name] = state
+            if len(chunk) == CHECKPOINT_FILES:
+                break
+        if not chunk:
+            break
+
+        # Writer errors name the output file, so map outputs back to their input
+        inputs_by_output = {output_file_name(name, spec.output_format): name for name in chunk}
+        remaining = chunk
+        attempts = 0
+        errors = {}
+        while remaining and attempts <= spec.retries:
+            attempts += 1
+            _, _, conversion_errors = convert_files(
+                spec.input_dir, remaining, spec.variants, output_format=spec.output_format,
+                transparency=spec.transparency, compress_level=spec.compress_level,
+                strategy=spec.strategy, pixel_cache=spec.pixel_cache,
+                render_cache=render_cache, render_pool=render_pool)
+            errors = {}
+            for path, error in conversion_errors:
+                errors[input_name(path, spec, inputs_by_output)] = error
+            for name in remaining:
+                if name not in errors:
+                    journal.record(name, "done", states[name], attempts=attempts)
+                    done += 1
+            remaining = [name for name in remaining if name in errors]
+        for name in remaining:
+            journal.record(name, "failed", states[name], error=str(errors[name]), attempts=attempts)
+            log(f"Failed after {attempts} attempts: {name}: {errors[name]}")
+            failed += 1
+        journal.checkpoint()
+        converted += len(chunk)
+        log(f"Checkpoint: {converted} files converted or failed")
+    if passed:
+        log(f"Resumed: {passed} files were already done or skipped")
+    return done, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run or resume a batch conversion described by a job-spec file")
+    parser.add_argument("job", help="job-spec file")
+    parser.add_argument("--journal", help="progress journal (default: next to the job-spec file)")
+    parser.add_argument("--retry-failed", action="store_true", help="try files that failed in earlier runs again")
+    parser.add_argument("--restart", action="store_true", help="ignore the journal and convert everything")
+    args = parser.parse_args(argv)
+
+    spec = JobSpec.load(args.job)
+    journal = JobJournal(args.journal or args.job + ".journal", spec.digest(), restart=args.restart)
+    try:
+        done, failed = run_job(spec, journal, args.retry_failed, RenderCache())
+    finally:
+        journal.close()
+    print(f"Converted {done} files" + (f", {failed} failed" if failed else ""))
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+BatchManifest.py - Records what produced each output so unchanged files can be skipped
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from ColorLUT import lut_effect_path, lut_digest
+
+# The manifest lives inside the output directory it describes
+MANIFEST_NAME = ".anycolor_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parameters_digest(parameters):
+    """Return a stable digest of an effect parameter set, and of the .cube file an imported LUT reads"""
+    encoded = json.dumps(parameters, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(encoded.encode("utf-8"))
+    lut_path = lut_effect_path(parameters.get("effect")) if isinstance(parameters, dict) else None
+    if lut_path is not None:
+        # Editing the LUT changes the output as much as editing the parameters
+        try:
+            digest.update(lut_digest(lut_path).encode("utf-8"))
+        except OSError:
+            pass  # Rendering reports the missing file
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """Per-output record of the input content hash and the effect parameters used"""
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.outputs = {}
+        self.parameter_sets = {}
+        self.load()
+
+    def load(self):
+        """Read the manifest, starting empty if it is missing or unreadable"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.outputs = data.get("outputs", {})
+        self.parameter_sets = data.get("parameter_sets", {})
+
+    def save(self):
+        """Write the manifest atomically"""
+        # Drop parameter sets no output refers to any more
+        used = {entry["parameters"] for entry in self.outputs.values()}
+        self.parameter_sets = {key: value for key, value in self.parameter_sets.items() if key in used}
+        data = {
+            "version": MANIFEST_VERSION,
+            "parameter_sets": self.parameter_sets,
+            "outputs": self.outputs
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.output_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def input_state(self, output_name, input_path):
+        """Hash the input, reusing the recorded hash if its mtime and size are unchanged"""
+        stat = os.stat(input_path)
+        state = {"input_mtime_ns": stat.st_mtime_ns, "input_size": stat.st_size}
+        entry = self.outputs.get(output_name)
+        if entry and all(entry.get(key) == value for key, value in state.items()):
+            state["input_hash"] = entry["input_hash"]
+        else:
+            state["input_hash"] = file_digest(input_path)
+        return state
+
+    def is_current(self, output_name, input_state, parameters_key):
+        """True if the output exists and was made from this input with the parameters digested as parameters_key
+
+        Callers checking many files compute parameters_digest once per parameter set.
+        """
+        entry = self.outputs.get(output_name)
+        if not entry:
+            return False
+        if entry["input_hash"] != input_state["input_hash"]:
+            return False
+        if entry["parameters"] != parameters_key:
+            return False
+        return os.path.exists(os.path.join(self.output_dir, output_name))
+
+    def record(self, output_name, input_path, input_state, parameters, parameters_key):
+        """Remember how output_name was produced; parameters_key is parameters_digest(parameters)"""
+        self.parameter_sets[parameters_key] = parameters
+        self.outputs[output_name] = dict(input_state, input=os.path.basename(input_path), parameters=parameters_key)
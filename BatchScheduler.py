@@ -0,0 +1,111 @@
+"""
+BatchScheduler.py - Memory-aware ordering and admission of batch render jobs
+"""
+
+import os
+import threading
+from PIL import Image
+from BatchStack import frame_memory, DEFAULT_STACK_MEMORY
+
+
+def default_memory_budget():
+    """Half the physical memory, or the stack default where it cannot be read"""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 2
+    except (AttributeError, ValueError, OSError):
+        return DEFAULT_STACK_MEMORY
+
+
+def image_dimensions(path):
+    """Width and height from the image header, without decoding the pixels"""
+    with Image.open(path) as image:
+        return image.size
+
+
+def plan_schedule(input_dir, image_files, parameter_sets):
+    """Return one job per file, ordered largest estimated peak memory first
+
+    Each job is a dict with the file name, its (width, height) and its
+    estimated peak memory. Large images go first so the small ones can fill
+    the remaining budget at the end. Files whose header cannot be read are put
+    last with no estimate; decoding reports their error.
+    """
+    jobs = []
+    for image_file in image_files:
+        try:
+            size = image_dimensions(os.path.join(input_dir, image_file))
+            memory = frame_memory(size[0], size[1], parameter_sets)
+        except Exception:
+            size, memory = None, 0
+        jobs.append({"file": image_file, "size": size, "memory": memory})
+    # sort is stable, so same-sized files keep their order and still stack together
+    jobs.sort(key=lambda job: job["memory"], reverse=True)
+    return jobs
+
+
+def schedule_report(jobs, memory_budget, workers):
+    """Describe a schedule: one line per image size in the order they will run"""
+    lines = [f"Scheduling {len(jobs)} images under a {format_bytes(memory_budget)} memory budget"]
+    runs = []
+    for job in jobs:
+        if runs and runs[-1][0] == job["size"]:
+            runs[-1][2] += 1
+        else:
+            runs.append([job["size"], job["memory"], 1])
+    for size, memory, count in runs:
+        if size is None:
+            lines.append(f"  {count} x unreadable header")
+            continue
+        concurrent = min(workers, memory_budget // memory) if memory else workers
+        if concurrent < 1:
+            concurrent_text = "runs alone, over budget"
+        else:
+            concurrent_text = f"up to {concurrent} at once"
+        lines.append(f"  {count} x {size[0]}x{size[1]}: ~{format_bytes(memory)} each, {concurrent_text}")
+    return lines
+
+
+def format_bytes(amount):
+    for unit in ("B", "KB", "MB", "GB"):
+        if amount < 1024 or unit == "GB":
+            return f"{amount:.0f} {unit}" if unit == "B" else f"{amount:.1f} {unit}"
+        amount /= 1024
+
+
+class MemoryBudget:
+    """Admits jobs while the sum of their estimated peak memory fits the budget"""
+    def __init__(self, budget):
+        self.budget = budget
+        self.in_use = 0
+        self.peak = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount):
+        """Block until amount fits; a job larger than the budget waits to run alone"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_use == 0 or self.in_use + amount <= self.budget)
+            self.in_use += amount
+            self.peak = max(self.peak, self.in_use)
+
+    def release(self, amount):
+        with self.condition:
+            self.in_use -= amount
+            self.condition.notify_all()
+
+    def admit(self, amount):
+        """Context manager holding amount of the budget"""
+        return _Admission(self, amount)
+
+
+class _Admission:
+    def __init__(self, budget, amount):
+        self.budget = budget
+        self.amount = amount
+
+    def __enter__(self):
+        self.budget.acquire(self.amount)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.budget.release(self.amount)
+        return False
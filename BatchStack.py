@@ -0,0 +1,112 @@
+"""
+BatchStack.py - Renders stacks of same-sized images as one array
+"""
+
+import numpy as np
+from PIL import Image
+from ImageEffects import (
+    apply_color_adjustments, apply_color_option, slider_offsets,
+    HSVPlanes, OpaqueIndex, is_rgb_only,
+    glow_padding, glow_color, glow_layer_alpha, composite_under
+)
+
+# Rough peak working memory per pixel of a stack: the RGBA copies, the float32
+# RGB and HSV planes and the intermediates of the HSV to RGB conversion
+STACK_BYTES_PER_PIXEL = 64
+DEFAULT_STACK_MEMORY = 512 * 1024 * 1024
+MAX_STACK_SIZE = 64
+
+
+def frame_memory(width, height, parameter_sets):
+    """Estimated peak working memory of rendering one width x height image"""
+    # The widest glow or border decides the padded canvas size
+    padding = max((glow_padding(p["glow"]["type"], p["glow"]["width"])
+                   for p in parameter_sets if p["glow"]["type"] != "None"), default=0)
+    return (width + padding) * (height + padding) * STACK_BYTES_PER_PIXEL
+
+
+def stack_batch_size(width, height, parameter_sets, memory_budget=DEFAULT_STACK_MEMORY,
+                     max_batch=MAX_STACK_SIZE):
+    """Number of width x height images that fit into one stack under memory_budget"""
+    per_image = frame_memory(width, height, parameter_sets)
+    return max(1, min(max_batch, memory_budget // per_image))
+
+
+def render_stack(stack, parameter_sets):
+    """Render an (N, H, W, 4) stack with each parameter set, returning one stack per set
+
+    The frames are processed as one tall image, so every color stage and preset
+    runs once for the whole stack. Results match rendering each frame alone.
+    """
+    count, height, width, _ = stack.shape
+    tall = Image.fromarray(np.ascontiguousarray(stack).reshape(count * height, width, 4))
+    pixels = OpaqueIndex.from_array(np.asarray(tall), frame_height=height)
+
+    source_planes = None
+    shared = {}  # slider values -> [color-adjusted tall image, HSVPlanes or None]
+    glow_alphas = {}  # (glow type, width) -> (layer alpha, padded index), the same for every color variant
+    results = []
+    for parameters in parameter_sets:
+        # Color adjustments from the sliders
+        sliders = parameters["sliders"]
+        key = tuple(sorted(sliders.items()))
+        if key not in shared:
+            adjusted = tall
+            if any(value != 0 for value in sliders.values()):
+                offsets = slider_offsets(sliders["cyan_red"], sliders["magenta_green"],
+                                         sliders["yellow_blue"], sliders["hue"])
+                if source_planes is None:
+                    source_planes = HSVPlanes(tall, pixels)
+                adjusted = apply_color_adjustments(tall, *offsets, planes=source_planes)
+            shared[key] = [adjusted, None]
+        adjusted, planes = shared[key]
+
+        # Special effect on the color-adjusted letters
+        effect = parameters["effect"]
+        result = adjusted
+        if effect != "None":
+            if planes is None and not is_rgb_only(effect):
+                planes = shared[key][1] = HSVPlanes(adjusted, pixels)
+            result = apply_color_option(effect, adjusted, planes, pixels)
+        result = np.array(result).reshape(count, height, width, 4)
+
+        # Glow/border on padded frames
+        glow = parameters["glow"]
+        if glow["type"] != "None":
+            glow_key = (glow["type"], glow["width"])
+            if glow_key not in glow_alphas:
+                padded_pixels = pixels.padded(glow_padding(glow["type"], glow["width"]))
+                glow_alphas[glow_key] = (stack_glow_alpha(glow["type"], stack.shape, glow["width"],
+                                                          padded_pixels), padded_pixels)
+            layer_alpha, padded_pixels = glow_alphas[glow_key]
+            result = apply_glow_stack(glow["type"], result, glow["start_hue"], glow["width"],
+                                      layer_alpha, pixels, padded_pixels)
+
+        results.append(result)
+    return results
+
+
+def stack_glow_alpha(effect_type, shape, glow_width, padded_pixels):
+    """Glow or border layer alpha for every padded frame of a stack, given the padded index"""
+    count, height, width, _ = shape
+    padding = glow_padding(effect_type, glow_width)
+    masks = padded_pixels.mask().reshape(count, height + padding, width + padding)
+
+    # Blur and dilation are per-frame so glows never bleed into a neighbouring frame
+    alphas = np.empty_like(masks)
+    for frame in range(count):
+        alphas[frame] = glow_layer_alpha(effect_type, masks[frame], glow_width)
+    return alphas
+
+
+def apply_glow_stack(effect_type, stack, start_hue, glow_width, layer_alpha, pixels, padded_pixels):
+    """Composite a glow or border layer under the letters of every frame, on padded frames"""
+    count, height, width, _ = stack.shape
+    padding = glow_padding(effect_type, glow_width)
+
+    # Only the letters are placed, so the stack never needs a zero-padded copy;
+    # compositing is per-pixel and runs over the stack as one tall image
+    canvas = np.empty((count * (height + padding), width + padding, 4), dtype=np.uint8)
+    letters = pixels.gather(stack.reshape(count * height, width, 4), slice(None))
+    composite_under(canvas, glow_color(start_hue), layer_alpha, padded_pixels, letters)
+    return canvas.reshape(count, height + padding, width + padding, 4)
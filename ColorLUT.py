@@ -0,0 +1,169 @@
+"""
+ColorLUT.py - Reading, writing and applying 3D color lookup tables in .cube format
+"""
+
+import hashlib
+import os
+import numpy as np
+from PIL import Image, ImageFilter
+
+DEFAULT_LUT_SIZE = 33
+# Largest table Pillow's built-in interpolation accepts
+MAX_FILTER_LUT_SIZE = 65
+# An imported LUT is an effect named by this prefix and the absolute path of its .cube file
+LUT_EFFECT_PREFIX = "LUT:"
+
+# path -> ((mtime_ns, size), ColorLUT or digest), so batches parse each file once
+_loaded = {}
+_digests = {}
+
+
+def lut_effect(path):
+    """Effect name that applies the .cube file at path"""
+    return LUT_EFFECT_PREFIX + os.path.abspath(path)
+
+
+def lut_effect_path(effect):
+    """Path of the .cube file an effect name applies, or None for any other effect"""
+    if isinstance(effect, str) and effect.startswith(LUT_EFFECT_PREFIX):
+        return effect[len(LUT_EFFECT_PREFIX):]
+    return None
+
+
+def effect_label(effect):
+    """Short name of an effect for display"""
+    path = lut_effect_path(effect)
+    if path is None:
+        return effect
+    return "LUT " + os.path.splitext(os.path.basename(path))[0]
+
+
+def load_lut(path):
+    """Return the ColorLUT of a .cube file, parsed again only when the file changes"""
+    return _cached(_loaded, path, ColorLUT.read)
+
+
+def lut_digest(path):
+    """SHA-256 of a .cube file's contents, recomputed only when the file changes"""
+    def digest(path):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    return _cached(_digests, path, digest)
+
+
+def _cached(cache, path, load):
+    stat = os.stat(path)
+    state = (stat.st_mtime_ns, stat.st_size)
+    entry = cache.get(path)
+    if entry is None or entry[0] != state:
+        entry = cache[path] = (state, load(path))
+    return entry[1]
+
+
+def identity_lattice(size):
+    """(size**3, 3) uint8 RGB lattice points in .cube order, red changing fastest"""
+    steps = np.rint(np.linspace(0, 255, size)).astype(np.uint8)
+    b, g, r = np.meshgrid(steps, steps, steps, indexing="ij")
+    return np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+
+
+class ColorLUT:
+    """size**3 RGB output values in .cube order, applied with trilinear interpolation
+
+    Values are floats in 0-1. Inputs are mapped from 0-255 onto the domain
+    between domain_min and domain_max, as .cube files define it. Tables over
+    the standard 0-1 domain run through Pillow's C implementation; others
+    are interpolated with NumPy.
+    """
+    def __init__(self, table, size, domain_min=(0.0, 0.0, 0.0), domain_max=(1.0, 1.0, 1.0), title=None):
+        table = np.asarray(table, dtype=np.float32)
+        if size < 2 or table.shape != (size ** 3, 3):
+            raise ValueError(f"A {size}-point 3D LUT needs {size ** 3} RGB entries, got {table.shape[0]}")
+        self.table = table
+        self.size = size
+        self.domain_min = np.asarray(domain_min, dtype=np.float32)
+        self.domain_max = np.asarray(domain_max, dtype=np.float32)
+        self.title = title
+        self.filter = None
+        if (size <= MAX_FILTER_LUT_SIZE and not self.domain_min.any()
+                and np.array_equal(self.domain_max, np.ones(3, dtype=np.float32))):
+            self.filter = ImageFilter.Color3DLUT(size, table)
+
+    @classmethod
+    def read(cls, path):
+        """Parse a .cube file"""
+        size = None
+        title = None
+        domain_min, domain_max = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+        values = []
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                keyword, _, rest = line.partition(" ")
+                if keyword == "TITLE":
+                    title = rest.strip().strip('"')
+                elif keyword == "LUT_3D_SIZE":
+                    size = int(rest)
+                elif keyword == "LUT_1D_SIZE":
+                    raise ValueError(f"{os.path.basename(path)} is a 1D LUT; only 3D LUTs are supported")
+                elif keyword == "DOMAIN_MIN":
+                    domain_min = tuple(float(value) for value in rest.split())
+                elif keyword == "DOMAIN_MAX":
+                    domain_max = tuple(float(value) for value in rest.split())
+                elif keyword == "LUT_3D_INPUT_RANGE":
+                    low, high = (float(value) for value in rest.split())
+                    domain_min, domain_max = (low,) * 3, (high,) * 3
+                else:
+                    values.append(line)
+        if size is None:
+            raise ValueError(f"{os.path.basename(path)} has no LUT_3D_SIZE")
+        table = np.array(" ".join(values).split(), dtype=np.float32)
+        if table.shape[0] % 3:
+            raise ValueError(f"{os.path.basename(path)} has a malformed data line")
+        return cls(table.reshape(-1, 3), size, domain_min, domain_max, title)
+
+    def write(self, path):
+        """Write the table as a .cube file"""
+        lines = []
+        if self.title:
+            lines.append(f'TITLE "{self.title}"')
+        lines.append(f"LUT_3D_SIZE {self.size}")
+        lines.append("DOMAIN_MIN " + " ".join(f"{value:g}" for value in self.domain_min))
+        lines.append("DOMAIN_MAX " + " ".join(f"{value:g}" for value in self.domain_max))
+        lines.extend(f"{r:.6f} {g:.6f} {b:.6f}" for r, g, b in self.table.tolist())
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def apply(self, rgb):
+        """Map (N, 3) uint8 colors through the table, returning (N, 3) uint8"""
+        if self.filter is None or not rgb.shape[0]:
+            return self.interpolate(rgb)
+        # The colors as a one pixel wide image
+        image = Image.fromarray(np.ascontiguousarray(rgb).reshape(-1, 1, 3), "RGB")
+        return np.asarray(image.filter(self.filter)).reshape(-1, 3)
+
+    def interpolate(self, rgb):
+        """NumPy trilinear interpolation of (N, 3) uint8 colors over any domain"""
+        size = self.size
+        span = np.maximum(self.domain_max - self.domain_min, 1e-6)
+        position = (rgb.astype(np.float32) / 255.0 - self.domain_min) / span * (size - 1)
+        np.clip(position, 0, size - 1, out=position)
+
+        # Lower corner of the enclosing cell and the position within it
+        corner = np.minimum(position.astype(np.int32), size - 2)
+        fraction = position - corner
+        base = (corner[:, 2] * size + corner[:, 1]) * size + corner[:, 0]
+
+        # Blend the cell's eight corners, one pair of faces per axis
+        result = np.zeros((rgb.shape[0], 3), dtype=np.float32)
+        for db in (0, 1):
+            weight_b = fraction[:, 2] if db else 1.0 - fraction[:, 2]
+            for dg in (0, 1):
+                weight_bg = weight_b * (fraction[:, 1] if dg else 1.0 - fraction[:, 1])
+                for dr in (0, 1):
+                    weight = weight_bg * (fraction[:, 0] if dr else 1.0 - fraction[:, 0])
+                    offset = (db * size + dg) * size + dr
+                    result += self.table[base + offset] * weight[:, np.newaxis]
+        return np.clip(result * 255.0 + 0.5, 0, 255).astype(np.uint8)
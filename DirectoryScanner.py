@@ -0,0 +1,120 @@
+"""
+DirectoryScanner.py - Streaming, pattern-filtered and naturally sorted directory listings
+"""
+
+import fnmatch
+import os
+import re
+import threading
+
+DEFAULT_PATTERNS = ("image*.png",)
+# Unsorted listings are handed on in batches of this many names
+SCAN_BATCH = 256
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def natural_key(name):
+    """Sort key ordering runs of digits by value, so image2 comes before image10"""
+    parts = _DIGITS.split(name.lower())
+    # split puts text at even and digits at odd positions, so compared parts always have the same type
+    return tuple(int(part) if index % 2 else part for index, part in enumerate(parts)), name
+
+
+def parse_patterns(text):
+    """Glob patterns from text separated by semicolons or spaces, e.g. "image*.png; *.jpg" """
+    patterns = tuple(pattern for pattern in re.split(r"[;\s]+", text) if pattern)
+    return patterns or DEFAULT_PATTERNS
+
+
+def compile_patterns(patterns):
+    """One case-insensitive regular expression matching file names against any of the glob patterns"""
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns), re.IGNORECASE)
+
+
+def scan_directory(directory, patterns=DEFAULT_PATTERNS, recursive=False, sort=True):
+    """Yield lists of matching file names relative to directory, as they are found
+
+    Each directory is read once with os.scandir, so no file is stat'ed beyond
+    what the listing itself returns. Hidden directories (the caches) and
+    symlinked directories are not entered. With sort, every directory's files
+    are yielded together in natural order, followed by its subdirectories in
+    natural order; without it, names are yielded in listing order in batches
+    of SCAN_BATCH, so consumers can start before a large directory has been
+    read to the end.
+    """
+    match = compile_patterns(patterns).match
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        names, subdirectories = [], []
+        try:
+            with os.scandir(os.path.join(directory, relative)) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            if match(entry.name):
+                                names.append(entry.name)
+                                if not sort and len(names) >= SCAN_BATCH:
+                                    yield _relative_paths(relative, names)
+                                    names = []
+                        elif recursive and entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                            subdirectories.append(entry.name)
+                    except OSError:
+                        continue  # Removed while listing
+        except OSError:
+            if not relative:
+                raise
+            continue  # An unreadable subdirectory does not stop the listing
+        if sort:
+            names.sort(key=natural_key)
+            subdirectories.sort(key=natural_key, reverse=True)
+        if names:
+            yield _relative_paths(relative, names)
+        pending.extend(_relative_paths(relative, subdirectories))
+
+
+def _relative_paths(relative, names):
+    if not relative:
+        return names
+    return [os.path.join(relative, name) for name in names]
+
+
+def iter_files(directory, patterns=DEFAULT_PATTERNS, recursive=False, sort=True):
+    """Yield matching file names one at a time; see scan_directory"""
+    for batch in scan_directory(directory, patterns, recursive, sort):
+        yield from batch
+
+
+class DirectoryListing:
+    """Lists a directory on a background thread, readable while the listing continues
+
+    files only ever grows, in the order scan_directory yields, so a reader
+    can poll it and take new names from where it stopped. finished is set
+    once the listing is complete, failed or cancelled, after the last names
+    were added; error holds the failure.
+    """
+    def __init__(self, directory, patterns=DEFAULT_PATTERNS, recursive=False, sort=True):
+        self.directory = directory
+        self.files = []
+        self.error = None
+        self.finished = False
+        self.cancelled = False
+        self.thread = threading.Thread(target=self._run, args=(patterns, recursive, sort),
+                                       name="DirectoryListing", daemon=True)
+        self.thread.start()
+
+    def _run(self, patterns, recursive, sort):
+        try:
+            for batch in scan_directory(self.directory, patterns, recursive, sort):
+                if self.cancelled:
+                    break
+                self.files.extend(batch)
+        except OSError as e:
+            self.error = e
+        finally:
+            self.finished = True
+
+    def cancel(self):
+        """Stop listing; names found so far stay in files"""
+        self.cancelled = True
@@ -0,0 +1,119 @@
+"""
+EffectGallery.py - Grid of every preset rendered on a small proxy of the current image
+"""
+
+import copy
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtWidgets import QListWidget, QListWidgetItem
+from PyQt6.QtCore import QObject, QSize, pyqtSignal
+from PyQt6.QtGui import QIcon, QImage, QPixmap
+
+GALLERY_PROXY_SIZE = 160
+GALLERY_ICON_SIZE = 72
+GALLERY_WORKERS = 4
+GALLERY_CACHED_IMAGES = 16
+GALLERY_GLOW_TYPES = ("glow", "border")
+
+
+class _RenderSignals(QObject):
+    # generation, row, parameters key, rendered QImage
+    rendered = pyqtSignal(int, int, str, object)
+
+
+class EffectGallery(QListWidget):
+    """One entry per preset, plus glow and border variants of the current effect
+
+    Entries are rendered on a proxy of the image on a thread pool and cached
+    per image, so picking an effect only costs the full-size render.
+    """
+    effect_chosen = pyqtSignal(str)
+    glow_chosen = pyqtSignal(str)
+
+    def __init__(self, effects, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListWidget.ViewMode.IconMode)
+        self.setResizeMode(QListWidget.ResizeMode.Adjust)
+        self.setMovement(QListWidget.Movement.Static)
+        self.setIconSize(QSize(GALLERY_ICON_SIZE, GALLERY_ICON_SIZE))
+        self.setSpacing(4)
+
+        # (label, effect or None, glow type or None)
+        self.entries = [(effect, effect, None) for effect in effects]
+        self.entries += [(glow_type.title(), None, glow_type) for glow_type in GALLERY_GLOW_TYPES]
+        for label, _, _ in self.entries:
+            self.addItem(QListWidgetItem(label))
+        self.itemClicked.connect(self._choose)
+
+        self.executor = ThreadPoolExecutor(max_workers=GALLERY_WORKERS, thread_name_prefix="Gallery")
+        self.signals = _RenderSignals()
+        self.signals.rendered.connect(self._show_render)
+        self.generation = 0
+        self.cache = OrderedDict()  # image key -> {parameters key: QIcon}
+        self.renders = None  # The current image's entry in cache
+
+    def refresh(self, image_key, image, parameters):
+        """Show every entry for image under the base parameters, rendering the ones not cached"""
+        self.generation += 1
+        self.renders = self.cache.setdefault(image_key, {})
+        self.cache.move_to_end(image_key)
+        while len(self.cache) > GALLERY_CACHED_IMAGES:
+            self.cache.popitem(last=False)
+
+        scale = min(1.0, GALLERY_PROXY_SIZE / max(image.size))
+        pending = []
+        for row, (_, effect, glow_type) in enumerate(self.entries):
+            entry_parameters = self.entry_parameters(parameters, effect, glow_type, scale)
+            key = json.dumps(entry_parameters, sort_keys=True)
+            icon = self.renders.get(key)
+            self.item(row).setIcon(icon or QIcon())
+            if icon is None:
+                pending.append((row, key, entry_parameters))
+        if not pending:
+            return
+
+        proxy = image.copy()
+        proxy.thumbnail((GALLERY_PROXY_SIZE, GALLERY_PROXY_SIZE))
+        # One task per worker; variants in a task share the slider pass
+        for start in range(GALLERY_WORKERS):
+            chunk = pending[start::GALLERY_WORKERS]
+            if chunk:
+                self.executor.submit(self._render, self.generation, proxy, chunk)
+
+    def entry_parameters(self, parameters, effect, glow_type, scale):
+        """Parameters of one entry: a preset without glow, or the current effect with a glow"""
+        entry = copy.deepcopy(parameters)
+        if effect is not None:
+            entry["effect"] = effect
+            entry["glow"]["type"] = "None"
+        else:
+            entry["glow"]["type"] = glow_type
+            # Keep the glow in proportion on the smaller proxy
+            entry["glow"]["width"] = max(1, round(entry["glow"]["width"] * scale))
+        return entry
+
+    def _render(self, generation, proxy, chunk):
+        from ImageEffects import render_variants
+        if generation != self.generation:
+            return  # A newer refresh has replaced this one
+        results = render_variants(proxy, [entry_parameters for _, _, entry_parameters in chunk])
+        for (row, key, _), result in zip(chunk, results):
+            data = result.tobytes("raw", "RGBA")
+            qimage = QImage(data, result.width, result.height, result.width * 4,
+                            QImage.Format.Format_RGBA8888).copy()
+            self.signals.rendered.emit(generation, row, key, qimage)
+
+    def _show_render(self, generation, row, key, qimage):
+        # Pixmaps can only be made on the GUI thread
+        icon = QIcon(QPixmap.fromImage(qimage))
+        if generation == self.generation:
+            self.renders[key] = icon
+            self.item(row).setIcon(icon)
+
+    def _choose(self, item):
+        _, effect, glow_type = self.entries[self.row(item)]
+        if effect is not None:
+            self.effect_chosen.emit(effect)
+        else:
+            self.glow_chosen.emit(glow_type)
@@ -1,7 +1,46 @@
 import numpy as np
 from PIL import Image, ImageFilter, ImageChops
 import colorsys
+import importlib
 import math
+import os
+import zlib
+from ColorLUT import ColorLUT, DEFAULT_LUT_SIZE, identity_lattice, load_lut, lut_effect_path
+
+# Output formats: name -> (Pillow format, file extension, save options)
+# The faster variants trade file size for encode time on intermediate outputs
+OUTPUT_FORMATS = {
+    "PNG": ("PNG", ".png", {}),
+    "PNG (Fast)": ("PNG", ".png", {"compress_level": 1, "compress_type": zlib.Z_RLE}),
+    "PNG (Uncompressed)": ("PNG", ".png", {"compress_level": 0}),
+    "WebP Lossless": ("WEBP", ".webp", {"lossless": True, "quality": 0, "method": 0}),
+    "QOI": ("QOI", ".qoi", {})
+}
+
+# Pillow plugin module that registers each output format's encoder
+FORMAT_PLUGINS = {
+    "PNG": "PIL.PngImagePlugin",
+    "WEBP": "PIL.WebPImagePlugin",
+    "QOI": "PIL.QoiImagePlugin"
+}
+
+# Palette-domain evaluation: images with at most PALETTE_MAX_COLORS distinct
+# colors, and at least PALETTE_MIN_REDUCTION pixels per color, are transformed
+# once per unique color instead of once per pixel
+PALETTE_MAX_COLORS = 4096
+PALETTE_MIN_REDUCTION = 4
+PALETTE_SAMPLE_SIZE = 8192
+PALETTE_TABLE_MIN_PIXELS = 1 << 16  # Below this np.unique is cheaper than the color table
+
+# zlib strategies accepted by the PNG encoder. Pillow picks the PNG row filters itself and
+# has no option for them, so the strategy is the knob for how filtered rows are compressed
+PNG_STRATEGIES = {
+    "Default": zlib.Z_DEFAULT_STRATEGY,
+    "Filtered": zlib.Z_FILTERED,
+    "Huffman Only": zlib.Z_HUFFMAN_ONLY,
+    "RLE": zlib.Z_RLE,
+    "Fixed": zlib.Z_FIXED
+}
 
 def adjust_pixel(r, g, b, a, cr_offset, mg_offset, yb_offset, hue_offset):
     """Adjust a single pixel's color values"""
@@ -58,27 +97,8 @@ def adjust_pixel(r, g, b, a, cr_offset, mg_offset, yb_offset, hue_offset):
     
     return int(rgb[0]), int(rgb[1]), int(rgb[2]), a
 
-def apply_color_option(option, image):
-    """Applies color effects to the image using NumPy vectorization"""
-    # Convert image to NumPy array
-    img_array = np.array(image)
-    alpha = img_array[:, :, 3]
-    mask = alpha > 0
-    
-    if not mask.any():  # No non-transparent pixels to process
-        return image
-        
-    if option == "Greyscale":
-        # Use luminosity method with NumPy broadcasting
-        rgb = img_array[mask, :3].astype(np.float32)
-        grey = np.dot(rgb, [0.299, 0.587, 0.114]).astype(np.uint8)
-        img_array[mask, 0] = grey
-        img_array[mask, 1] = grey
-        img_array[mask, 2] = grey
-        return Image.fromarray(img_array)
-    
-    # Convert RGB to HSV using NumPy operations
-    rgb = img_array[mask, :3].astype(np.float32) / 255.0
+def rgb_to_hsv_arrays(rgb):
+    """Vectorized RGB to HSV for an (N, 3) float array in [0, 1], hue in [0, 1)"""
     max_val = np.max(rgb, axis=1)
     min_val = np.min(rgb, axis=1)
     diff = max_val - min_val
@@ -105,55 +125,17 @@ def apply_color_option(option, image):
     s = np.divide(diff, max_val, out=np.zeros_like(diff), where=max_val!=0)
     v = max_val
     
-    # Apply effects using vectorized operations
-    if option == "Neon Outburst":
-        s = np.minimum(1.0, s * 1.8)
-        v = np.minimum(1.0, v * 1.2)
-    elif option == "Cyber Glow":
-        h = (h + 0.1) % 1.0
-        v = np.minimum(1.0, v * 1.3)
-    elif option == "Aurora Prism":
-        x_coords = np.tile(np.arange(image.width), (image.height, 1))[mask]
-        h = (h + (x_coords / image.width) * 0.2) % 1.0
-        s = np.minimum(1.0, s * 1.2)
-    elif option == "Chromatic Fragment":
-        s *= 0.8
-        h = (h + 0.05) % 1.0
-    elif option == "Vibrant Spectrum":
-        s = np.minimum(1.0, s * 1.5)
-    elif option == "Mystic Mirage":
-        s *= 0.7
-        v = np.minimum(1.0, v * 1.4)
-    elif option == "Holographic Shift":
-        y_coords = np.repeat(np.arange(image.height)[:, np.newaxis], image.width, axis=1)[mask]
-        h = (h + (y_coords / image.height) * 0.3) % 1.0
-    elif option == "Quantum Leap":
-        # Direct RGB inversion
-        img_array[mask, :3] = 255 - img_array[mask, :3]
-        return Image.fromarray(img_array)
-    elif option == "Psychedelic Cascade":
-        x_coords = np.tile(np.arange(image.width), (image.height, 1))[mask]
-        y_coords = np.repeat(np.arange(image.height)[:, np.newaxis], image.width, axis=1)[mask]
-        h = (h + ((x_coords + y_coords) / (image.width + image.height)) * 0.5) % 1.0
-    elif option == "Digital Overdrive":
-        v = 0.5 + (v - 0.5) * 1.8
-        v = np.clip(v, 0, 1)
-    elif option == "Earth Tones":
-        h = (h + 0.05) % 1.0
-        s *= 0.6
-        v *= 0.95
-    elif option == "Pastel Palette":
-        s *= 0.5
-        v = v + (1.0 - v) * 0.3
-    
-    # Convert back to RGB
+    return h, s, v
+
+def hsv_to_rgb_arrays(h, s, v):
+    """Vectorized HSV to RGB, returning an unclipped (N, 3) float32 array in [0, 255]"""
     c = v * s
     h_prime = h * 6.0
     x = c * (1 - np.abs(h_prime % 2 - 1))
     m = v - c
     
     # Initialize output RGB array
-    rgb_out = np.zeros_like(rgb)
+    rgb_out = np.zeros((h.shape[0], 3), dtype=np.float32)
     
     # Apply RGB conversion based on hue
     idx = (h_prime < 1)
@@ -174,92 +156,464 @@ def apply_color_option(option, image):
     idx = (h_prime >= 5)
     rgb_out[idx] = np.column_stack((c[idx], np.zeros_like(x[idx]), x[idx]))
     
-    # Add back the value offset and convert to 8-bit
-    rgb_out = np.clip((rgb_out + m[:, np.newaxis]) * 255, 0, 255).astype(np.uint8)
+    # Add back the value offset
+    return (rgb_out + m[:, np.newaxis]) * 255
+
+def unique_colors(rgb, max_colors):
+    """Return (colors, inverse) for an (N, 3) uint8 array, or (None, None) if it has more than max_colors"""
+    packed = (rgb[:, 0].astype(np.uint32) << 16) | (rgb[:, 1].astype(np.uint32) << 8) | rgb[:, 2]
+    
+    # A strided sample that already exceeds the limit saves looking at every pixel
+    sample = packed[::max(1, packed.shape[0] // PALETTE_SAMPLE_SIZE)]
+    if np.unique(sample).shape[0] > max_colors:
+        return None, None
+        
+    if packed.shape[0] < PALETTE_TABLE_MIN_PIXELS:
+        keys, inverse = np.unique(packed, return_inverse=True)
+        if keys.shape[0] > max_colors:
+            return None, None
+        inverse = inverse.reshape(-1).astype(np.int32)
+    else:
+        # 24-bit colors index a table directly, which is linear time unlike sorting
+        present = np.zeros(1 << 24, dtype=bool)
+        present[packed] = True
+        keys = np.flatnonzero(present)
+        if keys.shape[0] > max_colors:
+            return None, None
+        lookup = np.empty(1 << 24, dtype=np.int32)  # Only the pages of used colors get touched
+        lookup[keys] = np.arange(keys.shape[0], dtype=np.int32)
+        inverse = lookup[packed]
+        
+    colors = np.column_stack(((keys >> 16) & 255, (keys >> 8) & 255, keys & 255)).astype(np.uint8)
+    return colors, inverse
+
+class OpaqueIndex:
+    """Flat int32 index of the non-transparent pixels of an image, shared by every stage
+    
+    A stack of same-sized images can be indexed as one tall image of frames
+    that are frame_height rows each; coordinates are then relative to the frame.
+    """
+    def __init__(self, index, shape, frame_height=None):
+        self.index = index
+        self.shape = shape  # (height, width)
+        self.frame_height = frame_height or shape[0]
+        self._coordinates = None
+        self._frames = None
+
+    @classmethod
+    def from_array(cls, img_array, frame_height=None):
+        """Index the pixels of an (H, W, 4) array whose alpha is above zero"""
+        index = np.flatnonzero(img_array[:, :, 3]).astype(np.int32)
+        return cls(index, img_array.shape[:2], frame_height)
+
+    def frame_size(self):
+        """(width, height) of a single frame"""
+        return self.shape[1], self.frame_height
+
+    def any(self):
+        return self.index.shape[0] > 0
+
+    def gather(self, img_array, channels=slice(0, 3)):
+        """Return the indexed pixels of img_array as an (N, C) array"""
+        flat = img_array.reshape(-1, img_array.shape[2])
+        return np.take(flat, self.index, axis=0)[:, channels]
+
+    def scatter(self, img_array, values, channels=slice(0, 3)):
+        """Write values into the indexed pixels of img_array in place"""
+        flat = img_array.reshape(-1, img_array.shape[2])
+        flat[self.index, channels] = values
+
+    def coordinates(self):
+        """Row (within its frame) and column (int32) of every indexed pixel, computed on first use"""
+        if self._coordinates is None:
+            ys, xs = np.divmod(self.index, np.int32(self.shape[1]))
+            if self.frame_height != self.shape[0]:
+                self._frames, ys = np.divmod(ys, np.int32(self.frame_height))
+            self._coordinates = (ys, xs)
+        return self._coordinates
+
+    def mask(self):
+        """Return an (H, W) uint8 mask that is 255 on the indexed pixels"""
+        mask = np.zeros(self.shape[0] * self.shape[1], dtype=np.uint8)
+        mask[self.index] = 255
+        return mask.reshape(self.shape)
+
+    def padded(self, padding):
+        """Index of the same pixels once every frame grows by padding, centered"""
+        ys, xs = self.coordinates()
+        offset = padding // 2
+        width = self.shape[1] + padding
+        frame_height = self.frame_height + padding
+        frame_count = self.shape[0] // self.frame_height
+        if self._frames is not None:
+            ys = ys + self._frames * np.int32(frame_height)
+        index = (ys + offset) * width + (xs + offset)
+        return OpaqueIndex(index.astype(np.int32), (frame_count * frame_height, width), frame_height)
+
+class HSVPlanes:
+    """HSV decomposition of the non-transparent pixels of an image, reusable across effects
+    
+    Images with few distinct colors are decomposed in the palette domain: h, s
+    and v then hold one entry per unique color and inverse maps every
+    non-transparent pixel to its color. Per-pixel math gives identical results
+    on either domain, so effects only need per_pixel() when they mix in pixel
+    positions.
+    """
+    def __init__(self, image, pixels=None):
+        self.img_array = np.array(image)
+        # Stages that keep alpha untouched can pass on the index they already have
+        self.pixels = pixels or OpaqueIndex.from_array(self.img_array)
+        self.size = self.pixels.frame_size()
+        rgb = self.pixels.gather(self.img_array)
+        
+        # Only switch to the palette domain when it shrinks the work substantially
+        self.inverse = None
+        max_colors = min(PALETTE_MAX_COLORS, rgb.shape[0] // PALETTE_MIN_REDUCTION)
+        if max_colors > 0:
+            colors, inverse = unique_colors(rgb, max_colors)
+            if colors is not None:
+                rgb, self.inverse = colors, inverse
+                
+        self.rgb = rgb.astype(np.float32) / 255.0
+        self.h, self.s, self.v = rgb_to_hsv_arrays(self.rgb)
+
+    def per_pixel(self, values):
+        """Expand palette-domain values to one entry per non-transparent pixel"""
+        if self.inverse is None:
+            return values
+        return values[self.inverse]
+
+    def to_image(self, rgb_out, expanded=False):
+        """Return a new image with rgb_out written into the non-transparent pixels"""
+        if not expanded:
+            rgb_out = self.per_pixel(rgb_out)
+        img_array = self.img_array.copy()
+        self.pixels.scatter(img_array, rgb_out)
+        return Image.fromarray(img_array)
+
+def apply_color_adjustments(image, cr_offset, mg_offset, yb_offset, hue_offset, planes=None):
+    """Applies hue rotation and color balance offsets to the non-transparent pixels"""
+    # Reuse a precomputed HSV decomposition when one is given
+    if planes is None:
+        planes = HSVPlanes(image)
+    
+    if not planes.pixels.any():  # No non-transparent pixels to process
+        return image
+        
+    # Rotate hue and convert back to RGB
+    h = (planes.h + hue_offset) % 1.0
+    rgb_out = hsv_to_rgb_arrays(h, planes.s, planes.v)
+    
+    # Apply color balance adjustments
+    rgb_out[:, 0] += cr_offset * 255
+    rgb_out[:, 1] += mg_offset * 255
+    rgb_out[:, 2] += yb_offset * 255
     
-    # Update the image array
-    img_array[mask, :3] = rgb_out
+    # Clip values to valid range
+    rgb_out = np.clip(rgb_out, 0, 255).astype(np.uint8)
     
-    return Image.fromarray(img_array)
+    return planes.to_image(rgb_out)
 
-def apply_glow_effect(effect_type, image, start_color_slider, border_width_slider):
-    """Applies a colored glow or border effect"""
-    if effect_type == "None":
+def slider_offsets(cyan_red, magenta_green, yellow_blue, hue):
+    """Convert raw slider values into the offsets used by apply_color_adjustments"""
+    return (
+        (cyan_red / 100) * 0.5,
+        (magenta_green / 100) * 0.5,
+        (yellow_blue / 100) * 0.5,
+        hue / 360.0
+    )
+
+# Keys of an effect parameter set's "sliders" section, as slider_offsets takes them
+SLIDER_KEYS = ("cyan_red", "magenta_green", "yellow_blue", "hue")
+
+# Glow section types; "None" draws nothing and ignores the other glow settings
+GLOW_TYPES = ("None", "glow", "border")
+
+# Effects that work directly on RGB and never need the HSV decomposition
+RGB_ONLY_EFFECTS = ("None", "Greyscale", "Quantum Leap")
+
+# Effects whose result depends on pixel position, not only on pixel color
+POSITIONAL_EFFECTS = ("Aurora Prism", "Holographic Shift", "Psychedelic Cascade")
+
+def is_rgb_only(option):
+    """True for effects that never need the HSV decomposition, imported LUTs included"""
+    return option in RGB_ONLY_EFFECTS or lut_effect_path(option) is not None
+
+def apply_lut(lut, rgb):
+    """Map (N, 3) uint8 colors through a ColorLUT, once per distinct color where that is fewer"""
+    max_colors = min(PALETTE_MAX_COLORS, rgb.shape[0] // PALETTE_MIN_REDUCTION)
+    if max_colors > 0:
+        colors, inverse = unique_colors(rgb, max_colors)
+        if colors is not None:
+            return lut.apply(colors)[inverse]
+    return lut.apply(rgb)
+
+def pipeline_lut(parameters, size=DEFAULT_LUT_SIZE):
+    """Bake the slider and special effect stages of a parameter set into a ColorLUT
+    
+    Raises ValueError for effects that depend on pixel position, which no
+    color lookup can reproduce.
+    """
+    effect = parameters["effect"]
+    if effect in POSITIONAL_EFFECTS:
+        raise ValueError(f"{effect} depends on pixel position and cannot be exported as a LUT")
+    
+    # Render every lattice point as one opaque pixel, without the glow
+    lattice = identity_lattice(size)
+    pixels = np.concatenate([lattice, np.full((lattice.shape[0], 1), 255, dtype=np.uint8)], axis=1)
+    lattice_parameters = dict(parameters, glow=dict(parameters["glow"], type="None"))
+    result = render_image(Image.fromarray(pixels.reshape(size * size, size, 4)), lattice_parameters)
+    
+    rgb = np.asarray(result)[..., :3].reshape(-1, 3)
+    return ColorLUT(rgb.astype(np.float32) / 255.0, size, title=f"AnyColor {effect}")
+
+def apply_color_option(option, image, planes=None, pixels=None):
+    """Applies color effects to the image using NumPy vectorization"""
+    if is_rgb_only(option):
+        # Convert image to NumPy array
+        img_array = np.array(image)
+        if pixels is None:
+            pixels = planes.pixels if planes else OpaqueIndex.from_array(img_array)
+    else:
+        # Reuse a precomputed HSV decomposition when one is given
+        if planes is None:
+            planes = HSVPlanes(image, pixels)
+        pixels = planes.pixels
+    
+    if option == "None" or not pixels.any():  # No non-transparent pixels to process
         return image
         
-    # Get color directly from the slider - no hue adjustment
-    hue = start_color_slider.value() / 360.0
-    r, g, b = [int(x * 255) for x in colorsys.hsv_to_rgb(hue, 1.0, 1.0)]
+    lut_path = lut_effect_path(option)
+    if lut_path is not None:
+        # Imported grade from a .cube file
+        pixels.scatter(img_array, apply_lut(load_lut(lut_path), pixels.gather(img_array)))
+        return Image.fromarray(img_array)
     
-    # Get the width from slider
-    glow_width = border_width_slider.value()
+    if option == "Greyscale":
+        # Use luminosity method with NumPy broadcasting
+        rgb = pixels.gather(img_array).astype(np.float32)
+        grey = np.dot(rgb, [0.299, 0.587, 0.114]).astype(np.uint8)
+        pixels.scatter(img_array, grey[:, np.newaxis])
+        return Image.fromarray(img_array)
     
-    # Convert image to numpy array for faster processing
-    img_array = np.array(image)
+    if option == "Quantum Leap":
+        # Direct RGB inversion
+        pixels.scatter(img_array, 255 - pixels.gather(img_array))
+        return Image.fromarray(img_array)
     
-    # Create mask from alpha channel
-    alpha_mask = (img_array[:, :, 3] > 0).astype(np.uint8) * 255
-    letter_mask = Image.fromarray(alpha_mask)
+    h, s, v = planes.h, planes.s, planes.v
+    width, height = planes.size
+    
+    # Position-dependent effects need one value per pixel rather than per color
+    expanded = option in POSITIONAL_EFFECTS
+    if expanded:
+        h, s, v = planes.per_pixel(h), planes.per_pixel(s), planes.per_pixel(v)
+    
+    # Apply effects using vectorized operations (never in place, planes may be shared)
+    if option == "Neon Outburst":
+        s = np.minimum(1.0, s * 1.8)
+        v = np.minimum(1.0, v * 1.2)
+    elif option == "Cyber Glow":
+        h = (h + 0.1) % 1.0
+        v = np.minimum(1.0, v * 1.3)
+    elif option == "Aurora Prism":
+        _, x_coords = pixels.coordinates()
+        h = (h + (x_coords / width) * 0.2) % 1.0
+        s = np.minimum(1.0, s * 1.2)
+    elif option == "Chromatic Fragment":
+        s = s * 0.8
+        h = (h + 0.05) % 1.0
+    elif option == "Vibrant Spectrum":
+        s = np.minimum(1.0, s * 1.5)
+    elif option == "Mystic Mirage":
+        s = s * 0.7
+        v = np.minimum(1.0, v * 1.4)
+    elif option == "Holographic Shift":
+        y_coords, _ = pixels.coordinates()
+        h = (h + (y_coords / height) * 0.3) % 1.0
+    elif option == "Psychedelic Cascade":
+        y_coords, x_coords = pixels.coordinates()
+        h = (h + ((x_coords + y_coords) / (width + height)) * 0.5) % 1.0
+    elif option == "Digital Overdrive":
+        v = 0.5 + (v - 0.5) * 1.8
+        v = np.clip(v, 0, 1)
+    elif option == "Earth Tones":
+        h = (h + 0.05) % 1.0
+        s = s * 0.6
+        v = v * 0.95
+    elif option == "Pastel Palette":
+        s = s * 0.5
+        v = v + (1.0 - v) * 0.3
+    
+    # Convert back to RGB and 8-bit
+    rgb_out = np.clip(hsv_to_rgb_arrays(h, s, v), 0, 255).astype(np.uint8)
+    
+    return planes.to_image(rgb_out, expanded)
 
+def glow_color(start_hue):
+    """RGB of the glow/border color for a hue in degrees"""
+    # Get color directly from the hue - no hue adjustment
+    hue = start_hue / 360.0
+    return [int(x * 255) for x in colorsys.hsv_to_rgb(hue, 1.0, 1.0)]
+
+def glow_layer_alpha(effect_type, alpha_mask, glow_width):
+    """Alpha of the glow or border layer for a letter mask that is 255 on opaque pixels"""
+    letter_mask = Image.fromarray(alpha_mask)
+    
     if effect_type == "glow":  # Glow effect
-        # Apply gaussian blur to mask
-        test_layer = letter_mask.filter(ImageFilter.GaussianBlur(glow_width * 2))
-        blur_array = np.array(test_layer)
+        # Apply gaussian blur to mask, glow only shows outside the letter
+        blur_array = np.array(letter_mask.filter(ImageFilter.GaussianBlur(glow_width * 2)))
+        return np.where(alpha_mask == 0, blur_array, 0)
         
-        # Create glow layer using numpy operations
-        mask_3d = blur_array[:, :, np.newaxis]
-        glow_layer = np.zeros_like(img_array)
-        glow_layer[:, :, 0] = r
-        glow_layer[:, :, 1] = g
-        glow_layer[:, :, 2] = b
-        glow_layer[:, :, 3] = np.where(img_array[:, :, 3] == 0, blur_array, 0)
-        
-        # Convert back to PIL for alpha compositing
-        glow_image = Image.fromarray(glow_layer, 'RGBA')
-        
-        # Composite the glow under the original image
-        result = Image.alpha_composite(glow_image, image)
-        image.paste(result, (0, 0))
-
-    elif effect_type == "border":  # Border effect
-        # Use MaxFilter for dilation
-        filter_size = glow_width * 2 + 1
-        dilated_mask = letter_mask.filter(ImageFilter.MaxFilter(filter_size))
-        dilated_array = np.array(dilated_mask)
-        
-        # Create border mask using numpy operations
-        border_mask = dilated_array - alpha_mask
-        
-        # Create border layer
-        border_layer = np.zeros_like(img_array)
-        border_layer[:, :, 0] = r
-        border_layer[:, :, 1] = g
-        border_layer[:, :, 2] = b
-        border_layer[:, :, 3] = border_mask
-        
-        # Convert back to PIL for compositing
-        border_image = Image.fromarray(border_layer, 'RGBA')
-        
-        # Composite border with original image
-        result = Image.alpha_composite(border_image, image)
-        image.paste(result, (0, 0))
+    # Border effect: use MaxFilter for dilation
+    filter_size = glow_width * 2 + 1
+    dilated_array = np.array(letter_mask.filter(ImageFilter.MaxFilter(filter_size)))
+    return dilated_array - alpha_mask
+
+def composite_under(canvas, color, layer_alpha, pixels, letters):
+    """Fill an (H, W, 4) canvas with a one-color layer and composite letter pixels over it, in place
+
+    pixels indexes where the (N, 4) RGBA letters go in the canvas. Gives the
+    same pixels as Image.alpha_composite(layer, image) for an image that is
+    transparent outside the letters: everything else is the layer, and the
+    letters are only blended where the layer also shows through them.
+    """
+    under = layer_alpha.reshape(-1)[pixels.index]
+    canvas[..., :3] = color
+    canvas[..., 3] = layer_alpha.reshape(canvas.shape[:2])
+    
+    blend = (under > 0) & (letters[:, 3] < 255)
+    if blend.any():
+        letters = letters.copy()
+        letters[blend] = blend_over(letters[blend], color, under[blend])
+    pixels.scatter(canvas, letters, slice(None))
+    return canvas
+
+def blend_over(src, color, dst_alpha):
+    """(N, 4) src pixels with alpha above zero over one color, using Pillow's integer math"""
+    sa = src[:, 3].astype(np.uint32)
+    outa255 = sa * 255 + dst_alpha.astype(np.uint32) * (255 - sa)
+    coef1 = sa * (255 * 255 * 128) // outa255
+    coef2 = 255 * 128 - coef1
+    rgb = (src[:, :3].astype(np.uint32) * coef1[:, None]
+           + np.array(color, dtype=np.uint32) * coef2[:, None] + (0x80 << 7))
+    alpha = outa255 + 0x80
+    
+    # ((x >> 8) + x) >> 8 divides by 255 with rounding, as Pillow does
+    out = np.empty_like(src)
+    out[:, :3] = (((rgb >> 8) + rgb) >> 8) >> 7
+    out[:, 3] = ((alpha >> 8) + alpha) >> 8
+    return out
+
+class PaddedCanvas:
+    """RGBA buffer for an image grown by the glow padding, with the image at a logical offset
+    
+    Stages before the glow keep working on the unpadded image; only the glow
+    writes the margin, placing the letters straight into the canvas. With
+    reuse the buffer is kept while the padded size stays the same, so an
+    image returned from it is overwritten by the next one.
+    """
+    def __init__(self, reuse=False):
+        self.reuse = reuse
+        self.array = None
+
+    def buffer(self, width, height, padding):
+        """Uninitialized (height + padding, width + padding, 4) uint8 array"""
+        shape = (height + padding, width + padding, 4)
+        if self.array is not None and self.array.shape == shape:
+            return self.array
+        array = np.empty(shape, dtype=np.uint8)
+        if self.reuse:
+            self.array = array
+        return array
+
+    def pad(self, image, padding):
+        """Return image centered on a transparent canvas grown by padding"""
+        array = self.buffer(image.width, image.height, padding)
+        array[...] = 0
+        offset = padding // 2
+        array[offset:offset + image.height, offset:offset + image.width] = np.asarray(image.convert("RGBA"))
+        return Image.fromarray(array, 'RGBA')
+
+def apply_glow_effect(effect_type, image, start_hue, glow_width, pixels=None, canvas=None):
+    """Returns image grown by the glow padding with a colored glow or border under it (start_hue in degrees)
+    
+    pixels indexes the non-transparent pixels of the unpadded image.
+    """
+    if effect_type == "None":
+        return image
+    
+    # Convert image to numpy array for faster processing
+    img_array = np.asarray(image)
+    if pixels is None:
+        pixels = OpaqueIndex.from_array(img_array)
+    
+    # The letter's pixels keep their index, shifted by the padding
+    padding = glow_padding(effect_type, glow_width)
+    padded_pixels = pixels.padded(padding)
+    layer_alpha = glow_layer_alpha(effect_type, padded_pixels.mask(), glow_width)
+    
+    # Composite the glow under the letter straight into the padded canvas
+    canvas = (canvas or PaddedCanvas()).buffer(image.width, image.height, padding)
+    composite_under(canvas, glow_color(start_hue), layer_alpha, padded_pixels,
+                    pixels.gather(img_array, slice(None)))
+    return Image.fromarray(canvas, 'RGBA')
+
+def available_output_formats():
+    """List the output formats the installed Pillow build can write"""
+    formats = []
+    for name, (pil_format, _, _) in OUTPUT_FORMATS.items():
+        # Importing just the format's plugin is far cheaper than Image.init() loading all of them
+        try:
+            importlib.import_module(FORMAT_PLUGINS[pil_format])
+        except ImportError:
+            continue
+        if pil_format in Image.SAVE:
+            formats.append(name)
+    return formats
 
-    return image
+def output_file_name(file_name, output_format="PNG"):
+    """Swap the extension of file_name for the one used by output_format"""
+    extension = OUTPUT_FORMATS[output_format][1]
+    return os.path.splitext(file_name)[0] + extension
 
-def save_image_with_transparency(image, file_path, transparency):
+def save_image_with_transparency(image, file_path, transparency, output_format="PNG",
+                                 compress_level=None, strategy=None):
     """Save image with or without transparency based on checkbox state"""
+    pil_format, _, options = OUTPUT_FORMATS[output_format]
+    options = dict(options)
+    if pil_format == "PNG":
+        # Explicit compression level and zlib strategy override the format defaults
+        if compress_level is not None:
+            options["compress_level"] = compress_level
+        if strategy is not None:
+            options["compress_type"] = PNG_STRATEGIES[strategy]
+    
     if transparency:
         # Save with transparency (RGBA)
-        image.save(file_path, 'PNG')
+        image.save(file_path, pil_format, **options)
     else:
         # Save with white background (RGB)
-        background = Image.new("RGB", image.size, (255, 255, 255))
-        # Use alpha composite to properly blend with white background
-        if image.mode == 'RGBA':
-            background.paste(image, mask=image.split()[3])
-        else:
-            background.paste(image)
-        background.save(file_path, 'PNG')
+        flatten_alpha(image).save(file_path, pil_format, **options)
+
+def flatten_alpha(image, background=(255, 255, 255)):
+    """Blend an image onto a solid background color in a single NumPy pass"""
+    if image.mode not in ('RGBA', 'RGBa'):
+        return image.convert('RGB')
+        
+    img_array = np.asarray(image)
+    rgb = img_array[:, :, :3].astype(np.uint16)
+    alpha = img_array[:, :, 3:].astype(np.uint16)
+    background_term = np.array(background, dtype=np.uint16) * (255 - alpha)
+    
+    # Everything stays in uint16: 255 * 255 plus the rounding term fits
+    if image.mode == 'RGBa':
+        # Premultiplied input already carries the alpha factor in its color
+        out = rgb + (background_term + 127) // 255
+    else:
+        out = (rgb * alpha + background_term + 127) // 255
+        
+    return Image.fromarray(np.minimum(out, 255).astype(np.uint8), 'RGB')
 
 def get_gradient_colors(x, y, width, height, start_hue, end_hue, gradient_type, gradient_direction):
     """Calculate color based on position and current settings"""
@@ -285,45 +639,53 @@ def get_gradient_colors(x, y, width, height, start_hue, end_hue, gradient_type,
     hue = start_hue + t * ((end_hue - start_hue) % 1.0)
     return [int(x * 255) for x in colorsys.hsv_to_rgb(hue, 1.0, 1.0)]
 
-def adjust_image_size(image, effect_type, border_width):
-    """Adjust image size based on border/glow width"""
-    if not image or effect_type == "None":
-        return image
-        
-    # Increase padding multiplier to account for full glow spread
-    if effect_type == "glow":
-        padding = border_width * 8  # Double the padding for glow effects
-    else:
-        padding = border_width * 4  # Original padding for border effects
-    
-    # Create new image with padding
-    new_width = image.width + padding
-    new_height = image.height + padding
-    new_image = Image.new('RGBA', (new_width, new_height), (0, 0, 0, 0))
-    
-    # Paste original image in center
-    paste_x = padding // 2
-    paste_y = padding // 2
-    new_image.paste(image, (paste_x, paste_y))
-    
-    return new_image
+def render_image(image, parameters):
+    """Runs the full effect pipeline described by an effect parameter set"""
+    return render_variants(image, [parameters])[0]
 
-def adjust_size_for_glow(image, effect_type, border_width):
-    """Adjust image size for glow using the current adjusted image"""
-    if not image:
-        return image
+def render_variants(image, parameter_sets):
+    """Renders one image with several parameter sets, sharing the slider pass and HSV decomposition"""
+    shared = {}  # slider values -> [color-adjusted image, HSVPlanes or None]
+    source_planes = None
+    pixels = None
+    results = []
+    for parameters in parameter_sets:
+        # Color adjustments from the sliders
+        sliders = parameters["sliders"]
+        key = tuple(sorted(sliders.items()))
+        if key not in shared:
+            adjusted = image
+            if any(value != 0 for value in sliders.values()):
+                offsets = slider_offsets(sliders["cyan_red"], sliders["magenta_green"],
+                                         sliders["yellow_blue"], sliders["hue"])
+                if source_planes is None:
+                    source_planes = HSVPlanes(image)
+                adjusted = apply_color_adjustments(image, *offsets, planes=source_planes)
+            shared[key] = [adjusted, None]
+        adjusted, planes = shared[key]
         
-    # Increase padding multiplier based on effect type
-    if effect_type == "glow":
-        padding = border_width * 8  # For glow effects
-    else:
-        padding = border_width * 4  # For border effects
+        # No stage changes alpha, so one opaque pixel index serves them all
+        if pixels is None:
+            pixels = source_planes.pixels if source_planes else OpaqueIndex.from_array(np.asarray(image))
         
-    new_width = image.width + padding
-    new_height = image.height + padding
-    new_image = Image.new('RGBA', (new_width, new_height), (0, 0, 0, 0))
-    paste_x = padding // 2
-    paste_y = padding // 2
-    new_image.paste(image, (paste_x, paste_y))
-    
-    return new_image 
\ No newline at end of file
+        # Special effect on the color-adjusted letter
+        effect = parameters["effect"]
+        result = adjusted
+        if effect != "None":
+            if planes is None and not is_rgb_only(effect):
+                planes = shared[key][1] = HSVPlanes(adjusted, pixels)
+            result = apply_color_option(effect, adjusted, planes, pixels)
+        
+        # Glow/border on a padded canvas
+        glow = parameters["glow"]
+        if glow["type"] != "None":
+            result = apply_glow_effect(glow["type"], result, glow["start_hue"], glow["width"], pixels)
+        
+        results.append(result)
+    return results
+
+def glow_padding(effect_type, border_width):
+    """Total extra width and height added around the image for a glow or border"""
+    if effect_type == "glow":
+        return border_width * 8
+    return border_width * 4
@@ -0,0 +1,80 @@
+"""
+ImageWriter.py - Background image writer for batch output
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ImageEffects import save_image_with_transparency
+
+
+class BackgroundImageWriter:
+    """Encodes and writes images on a thread pool so processing can continue meanwhile"""
+    def __init__(self, max_workers=2, max_pending=8, output_format="PNG",
+                 compress_level=None, strategy=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ImageWriter")
+        # Bound the number of queued images so a fast producer cannot fill memory
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.save_options = {
+            "output_format": output_format,
+            "compress_level": compress_level,
+            "strategy": strategy
+        }
+        self.lock = threading.Lock()
+        # Signalled when the last queued write finishes
+        self.idle = threading.Condition(self.lock)
+        self.queued = 0
+        self.written = []
+        self.errors = []
+
+    def submit(self, image, file_path, transparency):
+        """Queue an image for writing, blocking while too many writes are pending"""
+        self.pending.acquire()
+        with self.lock:
+            self.queued += 1
+        try:
+            return self.executor.submit(self._write, image, file_path, transparency)
+        except Exception:
+            self._finished()
+            raise
+
+    def _write(self, image, file_path, transparency):
+        try:
+            save_image_with_transparency(image, file_path, transparency, **self.save_options)
+            with self.lock:
+                self.written.append(file_path)
+        except Exception as e:
+            with self.lock:
+                self.errors.append((file_path, e))
+        finally:
+            self._finished()
+
+    def _finished(self):
+        with self.lock:
+            self.queued -= 1
+            if not self.queued:
+                self.idle.notify_all()
+        self.pending.release()
+
+    def flush(self):
+        """Wait for every queued write; returns (written, errors) since the last flush and forgets them
+
+        Lets a caller keep one writer open across batches and still tell
+        which files each batch wrote.
+        """
+        with self.lock:
+            while self.queued:
+                self.idle.wait()
+            written, self.written = self.written, []
+            errors, self.errors = self.errors, []
+        return written, errors
+
+    def close(self):
+        """Wait for all pending writes to finish"""
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
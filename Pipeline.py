@@ -0,0 +1,132 @@
+"""
+Pipeline.py - Streaming producer/consumer pipeline of threaded stages
+"""
+
+import queue
+import threading
+
+# Marks the end of the stream on a queue
+_END = object()
+
+
+class Stage:
+    """One pipeline step run by its own pool of worker threads
+
+    function takes one item and returns an iterable of output items (empty to
+    drop the item). flush, if given, is called once after the last item and
+    returns the items the stage still holds back.
+    """
+    def __init__(self, name, function, workers=1, flush=None):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.flush = flush
+
+
+class StageFailure:
+    """Stands in for an item whose processing raised; later stages pass it through"""
+    def __init__(self, stage_name, item, error):
+        self.stage_name = stage_name
+        self.item = item
+        self.error = error
+
+
+def run_pipeline(source, stages, queue_size=4):
+    """Yield the outputs of passing every item of source through stages
+
+    Each stage reads from a bounded queue, so a fast stage blocks instead of
+    running ahead of a slow one, and sustained throughput follows the slowest
+    stage. Items that fail are yielded as StageFailure. Output order is not
+    guaranteed once a stage has more than one worker.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(queue_size) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_feed, args=(source, queues[0], stages[0].workers, stop),
+                                name="Pipeline-source", daemon=True)]
+    for position, stage in enumerate(stages):
+        next_workers = stages[position + 1].workers if position + 1 < len(stages) else 1
+        remaining = [stage.workers]
+        lock = threading.Lock()
+        for number in range(stage.workers):
+            threads.append(threading.Thread(
+                target=_work,
+                args=(stage, queues[position], queues[position + 1], next_workers, remaining, lock, stop),
+                name=f"Pipeline-{stage.name}-{number}", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                break
+            yield item
+    finally:
+        # Unblock every thread if the consumer stops early
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _put(target, item, stop):
+    """Put with backpressure, giving up once the pipeline is stopped"""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(source, stop):
+    while not stop.is_set():
+        try:
+            return source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _feed(source, target, workers, stop):
+    try:
+        for item in source:
+            if not _put(target, item, stop):
+                return
+    except Exception as e:
+        _put(target, StageFailure("source", None, e), stop)
+    for _ in range(workers):
+        _put(target, _END, stop)
+
+
+def _work(stage, source, target, next_workers, remaining, lock, stop):
+    while True:
+        item = _get(source, stop)
+        if item is _END:
+            break
+        if isinstance(item, StageFailure):
+            outputs = [item]
+        else:
+            try:
+                outputs = list(stage.function(item))
+            except Exception as e:
+                outputs = [StageFailure(stage.name, item, e)]
+        for output in outputs:
+            if not _put(target, output, stop):
+                return
+
+    # The last worker of a stage flushes it and passes the end on
+    with lock:
+        remaining[0] -= 1
+        last = remaining[0] == 0
+    if not last or stop.is_set():
+        return
+    if stage.flush:
+        try:
+            outputs = list(stage.flush())
+        except Exception as e:
+            outputs = [StageFailure(stage.name, None, e)]
+        for output in outputs:
+            _put(target, output, stop)
+    for _ in range(next_workers):
+        _put(target, _END, stop)
@@ -0,0 +1,46 @@
+"""
+PixelCache.py - Disk cache of decoded RGBA pixels for repeated runs over the same images
+"""
+
+import os
+import numpy as np
+from PIL import Image
+from SourceCache import SourceFileCache
+
+# Decoded pixels are stored in a hidden directory next to the source images
+PIXEL_DIR_NAME = ".anycolor_pixels"
+
+
+class PixelCache(SourceFileCache):
+    """Stores each image's decoded RGBA pixels as .npy, invalidated by the source mtime and size
+
+    Cached pixels are memory-mapped read-only, so loading skips decompression
+    and only touches the pages that are read.
+    """
+    suffix = "npy"
+
+    def __init__(self, directory, cache_dir=None):
+        super().__init__(directory, cache_dir or os.path.join(directory, PIXEL_DIR_NAME))
+
+    def load(self, file_name):
+        """Return file_name's (H, W, 4) uint8 pixels, decoding and caching them if needed"""
+        source_path = os.path.join(self.directory, file_name)
+        stat = os.stat(source_path)
+        pixel_path = self.cache_path(file_name, stat)
+
+        if os.path.exists(pixel_path):
+            try:
+                pixels = np.load(pixel_path, mmap_mode="r")
+                if pixels.ndim == 3 and pixels.shape[2] == 4 and pixels.dtype == np.uint8:
+                    return pixels
+            except (OSError, ValueError):
+                pass  # Unreadable cache entry, rebuild it below
+
+        with Image.open(source_path) as image:
+            pixels = np.asarray(image.convert("RGBA"))
+        self.store(file_name, pixel_path, lambda f: np.save(f, pixels))
+        return pixels
+
+    def load_image(self, file_name):
+        """Return file_name as an RGBA image, through the cache"""
+        return Image.fromarray(self.load(file_name))
@@ -0,0 +1,125 @@
+"""
+RenderCache.py - Persistent content-addressed cache of rendered images
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+import numpy as np
+from BatchManifest import parameters_digest
+
+# Shared by every session and process of the current user
+RENDER_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                                "anycolor", "renders")
+DEFAULT_RENDER_CACHE_SIZE = 1 << 30
+# Temporary files older than this were left behind by a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+
+def render_digest(parameters):
+    """Digest of the parts of an effect parameter set that decide the rendered pixels
+
+    Without a glow the other glow settings change nothing, so they are left
+    out and renders that come out the same share one cache entry.
+    """
+    if parameters["glow"]["type"] == "None":
+        parameters = dict(parameters, glow={"type": "None"})
+    return parameters_digest(parameters)
+
+
+def render_key(input_digest, parameters_key):
+    """Cache key of rendering the input with the given digest using parameters with render_digest parameters_key"""
+    key = f"{input_digest}:{parameters_key}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Rendered RGBA pixels stored as .npy files, evicting least recently used past max_bytes
+
+    Writes are atomic renames and reads memory-map whole files, so several
+    processes can share one cache directory; an entry evicted by another
+    process simply becomes a miss.
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_RENDER_CACHE_SIZE):
+        self.cache_dir = cache_dir or RENDER_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.added = max_bytes  # Check the size on the first store
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def get(self, key):
+        """Return the cached (H, W, 4) pixels for key, or None"""
+        path = self.path(key)
+        try:
+            pixels = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # The modification time doubles as the last access time
+        except OSError:
+            pass
+        return pixels
+
+    def put(self, key, pixels):
+        """Store pixels under key, evicting old entries once the cache grows past its cap"""
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        except OSError:
+            return  # Unwritable cache, run uncached
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                np.save(temp_file, np.ascontiguousarray(pixels))
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        # Scanning the directory is only worth it after a fair amount was added
+        self.added += pixels.nbytes
+        if self.added >= self.max_bytes // 16:
+            self.added = 0
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits 90% of max_bytes"""
+        entries = []
+        total = 0
+        now = time.time()
+        try:
+            subdirs = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        except OSError:
+            return
+        for subdir in subdirs:
+            try:
+                for entry in os.scandir(subdir):
+                    stat = entry.stat()
+                    if entry.name.endswith(".tmp"):
+                        if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                            _remove(entry.path)
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            except OSError:
+                continue  # Another process is evicting too
+
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        target = self.max_bytes * 9 // 10
+        for _, size, path in entries:
+            if total <= target:
+                break
+            _remove(path)
+            total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # Already evicted by another process, or still open on Windows
@@ -0,0 +1,372 @@
+"""
+RenderServer.py - Local HTTP render service running the effect pipeline on a warm worker pool
+"""
+
+import argparse
+import asyncio
+import hashlib
+import http.client
+import io
+import json
+import socket
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit, parse_qs
+import numpy as np
+from PIL import Image
+from BatchConvert import check_parameters, CPU_WORKERS
+from BatchManifest import parameters_digest
+from BatchStack import render_stack
+from ImageEffects import OUTPUT_FORMATS, save_image_with_transparency
+from RenderCache import RenderCache, render_digest, render_key
+from SharedImages import SharedRenderPool
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PARAMETERS_HEADER = "X-AnyColor-Parameters"
+MAX_REQUEST_BYTES = 64 << 20
+# The dispatcher waits this long after a request for others to render in the same batch
+BATCH_WINDOW = 0.005
+MAX_BATCH = 16
+ENCODED_CACHE_ENTRIES = 256
+LATENCY_SAMPLES = 1000
+RESPONSE_CHUNK = 1 << 20
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class _RenderJob:
+    def __init__(self, pixels, parameters, future):
+        self.pixels = pixels
+        self.parameters = parameters
+        self.future = future
+        # Same-sized images with the same parameters render as one stack
+        self.batch_key = (pixels.shape, parameters_digest(parameters))
+
+
+class RenderService:
+    """Queues render requests and runs them in batches on a warm worker pool
+
+    Decoding and encoding run on a thread pool; rendering runs on the same
+    threads, or in worker processes through a SharedRenderPool. Encoded
+    results are kept in memory and rendered pixels in a RenderCache, and
+    identical requests arriving together share one render.
+    """
+    def __init__(self, processes=0, threads=CPU_WORKERS, render_cache=None,
+                 batch_window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="RenderService")
+        self.render_pool = SharedRenderPool(processes) if processes else None
+        self.render_cache = render_cache
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.encoded = OrderedDict()  # (render key, format, transparency) -> encoded bytes
+        self.in_progress = {}  # Same keys -> future of the encoded bytes
+        self.queue = None
+        self.dispatcher = None
+
+        self.started = time.time()
+        self.counts = {"requests": 0, "errors": 0, "memory_hits": 0, "cache_hits": 0,
+                       "coalesced": 0, "renders": 0, "batches": 0}
+        self.queued = 0  # Waiting for a batch to start rendering
+        self.rendering = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.render_times = deque(maxlen=LATENCY_SAMPLES)
+
+    def start(self):
+        """Start the dispatcher on the running event loop"""
+        self.queue = asyncio.Queue()
+        self.dispatcher = asyncio.get_running_loop().create_task(self.dispatch())
+
+    def close(self):
+        if self.dispatcher:
+            self.dispatcher.cancel()
+        self.executor.shutdown(wait=True)
+        if self.render_pool:
+            self.render_pool.close()
+
+    async def render(self, data, parameters, output_format="PNG", transparency=True):
+        """Render encoded image bytes with an effect parameter set, returning the encoded result"""
+        started = time.perf_counter()
+        self.counts["requests"] += 1
+        try:
+            key = (render_key(hashlib.sha256(data).hexdigest(), render_digest(parameters)), output_format, transparency)
+            result = self.encoded.get(key)
+            if result is not None:
+                self.encoded.move_to_end(key)
+                self.counts["memory_hits"] += 1
+            elif key in self.in_progress:
+                self.counts["coalesced"] += 1
+                result = await asyncio.shield(self.in_progress[key])
+            else:
+                future = self.in_progress[key] = asyncio.get_running_loop().create_future()
+                try:
+                    result = await self._render(key, data, parameters, output_format, transparency)
+                    future.set_result(result)
+                except Exception as e:
+                    future.set_exception(e)
+                    future.exception()  # Retrieved here when no other request waits on it
+                    raise
+                finally:
+                    del self.in_progress[key]
+                self.encoded[key] = result
+                while len(self.encoded) > ENCODED_CACHE_ENTRIES:
+                    self.encoded.popitem(last=False)
+        except Exception:
+            self.counts["errors"] += 1
+            raise
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    async def _render(self, key, data, parameters, output_format, transparency):
+        loop = asyncio.get_running_loop()
+        pixels = None
+        if self.render_cache:
+            pixels = await loop.run_in_executor(self.executor, self.render_cache.get, key[0])
+        if pixels is not None:
+            self.counts["cache_hits"] += 1
+        else:
+            source = await loop.run_in_executor(self.executor, decode_image, data)
+            job = _RenderJob(source, parameters, loop.create_future())
+            self.queued += 1
+            await self.queue.put(job)
+            pixels = await job.future
+            if self.render_cache:
+                loop.run_in_executor(self.executor, self.render_cache.put, key[0], pixels)
+        return await loop.run_in_executor(self.executor, encode_image, pixels, output_format, transparency)
+
+    async def dispatch(self):
+        """Collect queued requests into batches and hand them to the workers"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for job in batch:
+                groups.setdefault(job.batch_key, []).append(job)
+            for jobs in groups.values():
+                loop.create_task(self._render_group(jobs))
+
+    async def _render_group(self, jobs):
+        loop = asyncio.get_running_loop()
+        self.queued -= len(jobs)
+        self.rendering += len(jobs)
+        self.counts["batches"] += 1
+        started = time.perf_counter()
+        try:
+            frames = await loop.run_in_executor(self.executor, self._render_frames,
+                                                [job.pixels for job in jobs], jobs[0].parameters)
+            for job, frame in zip(jobs, frames):
+                job.future.set_result(frame)
+        except Exception as e:
+            for job in jobs:
+                job.future.set_exception(e)
+        finally:
+            self.rendering -= len(jobs)
+            self.counts["renders"] += len(jobs)
+            self.render_times.append(time.perf_counter() - started)
+
+    def _render_frames(self, frames, parameters):
+        if self.render_pool:
+            return self.render_pool.render(frames, [parameters])[0]
+        return render_stack(np.stack(frames), [parameters])[0]
+
+    def metrics(self):
+        """Queue depth, counters and latency percentiles as a JSON-serializable dict"""
+        return dict(
+            self.counts,
+            uptime=round(time.time() - self.started, 1),
+            queue_depth=self.queued,
+            rendering=self.rendering,
+            in_progress=len(self.in_progress),
+            mean_batch_size=round(self.counts["renders"] / self.counts["batches"], 2) if self.counts["batches"] else 0,
+            latency_ms=percentiles(self.latencies),
+            render_ms=percentiles(self.render_times)
+        )
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+    return {"p50": at(0.5), "p95": at(0.95), "max": round(ordered[-1] * 1000, 2)}
+
+
+def decode_image(data):
+    with Image.open(io.BytesIO(data)) as image:
+        return np.asarray(image.convert("RGBA"))
+
+
+def encode_image(pixels, output_format, transparency):
+    output = io.BytesIO()
+    save_image_with_transparency(Image.fromarray(np.asarray(pixels)), output, transparency, output_format)
+    return output.getvalue()
+
+
+async def handle_connection(service, reader, writer):
+    """Serve HTTP/1.1 requests on one connection until the client closes it"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                await send_response(writer, 400, b"Malformed request line", "text/plain")
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            try:
+                length = int(headers.get("content-length", 0) or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                await send_response(writer, 400, b"Invalid Content-Length", "text/plain")
+                break
+            if length > MAX_REQUEST_BYTES:
+                await send_response(writer, 413, b"Image too large", "text/plain")
+                break
+            body = await reader.readexactly(length) if length else b""
+            status, payload, content_type = await route(service, method, target, headers, body)
+            await send_response(writer, status, payload, content_type)
+            if version == "HTTP/1.0" or headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+        pass  # Client went away, or the server is stopping
+    finally:
+        writer.close()
+
+
+async def route(service, method, target, headers, body):
+    """Return (status, payload, content type) for one request"""
+    url = urlsplit(target)
+    if url.path == "/health":
+        return 200, b"ok", "text/plain"
+    if url.path == "/metrics":
+        return 200, json.dumps(service.metrics()).encode("utf-8"), "application/json"
+    if url.path != "/render":
+        return 404, b"Unknown path", "text/plain"
+    if method != "POST":
+        return 405, b"Use POST with the image as the body", "text/plain"
+
+    query = parse_qs(url.query)
+    output_format = query.get("format", ["PNG"])[0]
+    transparency = query.get("transparency", ["1"])[0] not in ("0", "false", "no")
+    try:
+        parameters = json.loads(headers.get(PARAMETERS_HEADER.lower(), ""))
+        check_parameters(parameters)
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format}")
+    except ValueError as e:
+        return 400, str(e).encode("utf-8"), "text/plain"
+    try:
+        result = await service.render(body, parameters, output_format, transparency)
+    except (OSError, SyntaxError, ValueError) as e:
+        # Pillow reports undecodable images as OSError or SyntaxError
+        return 400, f"Cannot render image: {e}".encode("utf-8"), "text/plain"
+    except Exception as e:
+        return 500, f"Render failed: {e}".encode("utf-8"), "text/plain"
+    return 200, result, "application/octet-stream"
+
+
+async def send_response(writer, status, payload, content_type):
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n\r\n")
+    writer.write(head.encode("latin-1"))
+    # Large results go out in chunks, so a slow client does not hold them all in the send buffer
+    for start in range(0, len(payload), RESPONSE_CHUNK):
+        writer.write(payload[start:start + RESPONSE_CHUNK])
+        await writer.drain()
+    await writer.drain()
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, ready=None):
+    """Run the server until cancelled; ready, if given, is called once it listens"""
+    service.start()
+    def handler(reader, writer):
+        return handle_connection(service, reader, writer)
+    if unix_path:
+        server = await asyncio.start_unix_server(handler, path=unix_path)
+    else:
+        server = await asyncio.start_server(handler, host, port)
+    if ready:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def render_remote(data, parameters, output_format="PNG", transparency=True,
+                  host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, timeout=60):
+    """Client side: render encoded image bytes on a running server and return the encoded result"""
+    if unix_path:
+        connection = _UnixConnection(unix_path, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        # Quoted, since format names such as "PNG (Fast)" contain spaces and parentheses
+        query = urlencode({"format": output_format, "transparency": int(transparency)})
+        target = f"/render?{query}"
+        connection.request("POST", target, body=data, headers={PARAMETERS_HEADER: json.dumps(parameters)})
+        response = connection.getresponse()
+        result = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"Render server answered {response.status}: {result.decode('utf-8', 'replace')}")
+        return result
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve AnyColor renders over local HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--processes", type=int, default=0, help="render in this many worker processes")
+    parser.add_argument("--threads", type=int, default=CPU_WORKERS, help="decode, encode and render threads")
+    parser.add_argument("--no-render-cache", action="store_true", help="do not keep rendered pixels on disk")
+    args = parser.parse_args(argv)
+
+    service = RenderService(processes=args.processes, threads=args.threads,
+                            render_cache=None if args.no_render_cache else RenderCache())
+    address = args.unix or f"http://{args.host}:{args.port}"
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix,
+                          ready=lambda server: print(f"Serving renders on {address}")))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+SharedImages.py - Shared memory image buffers for multi-process rendering
+"""
+
+import ctypes
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from ImageEffects import glow_padding
+from BatchStack import render_stack
+
+
+class SharedImage:
+    """NumPy array backed by a named shared memory block
+
+    Only the small handle (name, shape, dtype) crosses process boundaries. The
+    block stays mapped for as long as any view of the array is alive, so views
+    can be handed to other threads without tracking their lifetime.
+    """
+    def __init__(self, shape, dtype=np.uint8, name=None):
+        shape = tuple(int(n) for n in shape)
+        dtype = np.dtype(dtype)
+        if name is None:
+            size = max(1, int(np.prod(shape)) * dtype.itemsize)
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.owner = name is None
+        self.handle = (self.memory.name, shape, dtype.str)
+        self.array = np.asarray(_MappedBlock(self.memory, shape, dtype))
+
+    @classmethod
+    def attach(cls, handle):
+        """Map a block created by another process"""
+        name, shape, dtype = handle
+        return cls(shape, dtype, name)
+
+    @classmethod
+    def stack(cls, arrays):
+        """Copy same-shaped arrays into one new (N, ...) shared block"""
+        shared = cls((len(arrays),) + arrays[0].shape, arrays[0].dtype)
+        np.stack(arrays, out=shared.array)
+        return shared
+
+    def unlink(self):
+        """Remove the block's name; its memory is freed once every view is gone"""
+        if self.owner:
+            self.owner = False
+            self.memory.unlink()
+
+
+class _MappedBlock:
+    """Array interface over a shared memory block that keeps the block open
+
+    The pointer holds a buffer export of the mapping for as long as any view
+    is alive, so closing the block under a live view raises BufferError
+    instead of unmapping memory the view still reads.
+    """
+    def __init__(self, memory, shape, dtype):
+        self.pointer = ctypes.c_char.from_buffer(memory.buf)
+        self.memory = memory
+        self.__array_interface__ = {
+            "shape": shape,
+            "typestr": dtype.str,
+            "data": (ctypes.addressof(self.pointer), False),
+            "version": 3
+        }
+
+    def __del__(self):
+        # End the export before the block's own finalizer closes the mapping
+        self.pointer = None
+
+
+def stack_output_shape(shape, parameters):
+    """Shape of render_stack's result for one parameter set"""
+    count, height, width, channels = shape
+    glow = parameters["glow"]
+    padding = glow_padding(glow["type"], glow["width"]) if glow["type"] != "None" else 0
+    return (count, height + padding, width + padding, channels)
+
+
+def render_shared(stack_handle, parameter_sets, output_handles):
+    """Worker side: render a shared stack into preallocated shared outputs"""
+    stack = SharedImage.attach(stack_handle)
+    results = render_stack(stack.array, parameter_sets)
+    for handle, result in zip(output_handles, results):
+        SharedImage.attach(handle).array[...] = result
+    return len(results)
+
+
+class SharedRenderPool:
+    """Renders stacks in worker processes, passing pixels through shared memory"""
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.processes)
+
+    def render(self, frames, parameter_sets):
+        """Render same-sized frames with each parameter set, like render_stack
+
+        The frames are copied into shared memory once; the results are views of
+        shared blocks the worker wrote into, so no pixels go through a pipe.
+        """
+        stack = SharedImage.stack(frames)
+        outputs = [SharedImage(stack_output_shape(stack.array.shape, parameters))
+                   for parameters in parameter_sets]
+        try:
+            self.executor.submit(render_shared, stack.handle, parameter_sets,
+                                 [output.handle for output in outputs]).result()
+        finally:
+            # Names are only needed until the worker has attached
+            stack.unlink()
+            for output in outputs:
+                output.unlink()
+        return [output.array for output in outputs]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
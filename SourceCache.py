@@ -0,0 +1,76 @@
+"""
+SourceCache.py - Disk caches holding one entry per source image, invalidated by its mtime and size
+"""
+
+import os
+import re
+import tempfile
+import threading
+
+
+class SourceFileCache:
+    """Base of the thumbnail and pixel caches
+
+    Each source file has one entry in cache_dir named
+    <file name>.<tag><mtime>-<size>.<suffix>, so a changed source simply
+    misses. Files from subdirectories are cached in matching subdirectories.
+    Storing an entry removes the entries of older versions of the same file,
+    and entries are written through a temporary file so readers never see a
+    partial one.
+    """
+    suffix = ""
+
+    def __init__(self, directory, cache_dir, tag=""):
+        self.directory = directory
+        self.cache_dir = cache_dir
+        self.tag = tag
+        self.entry_name = re.compile(rf"(.+)\.{re.escape(tag)}[0-9a-f]+-[0-9a-f]+\.{re.escape(self.suffix)}")
+        # Cache directory -> {source file name: its entry names}, listed once on first store
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def cache_path(self, file_name, stat):
+        """Path of the entry for the given source file state"""
+        key = f"{self.tag}{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        return os.path.join(self.cache_dir, f"{file_name}.{key}.{self.suffix}")
+
+    def store(self, file_name, entry_path, write):
+        """Write the entry for file_name with write(file) and remove its older versions"""
+        entry_dir = os.path.dirname(entry_path)
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+        except OSError:
+            return  # Read-only directory, run uncached
+
+        entry_name = os.path.basename(entry_path)
+        with self.lock:
+            names = self.cached_names(entry_dir).setdefault(os.path.basename(file_name), set())
+            stale = [name for name in names if name != entry_name]
+            names.clear()
+            names.add(entry_name)
+        for name in stale:
+            try:
+                os.remove(os.path.join(entry_dir, name))
+            except OSError:
+                pass
+
+        fd, temp_path = tempfile.mkstemp(dir=entry_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                write(temp_file)
+            os.replace(temp_path, entry_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def cached_names(self, entry_dir):
+        """Entries in entry_dir by source file name, so stores need not rescan it"""
+        names = self.entries.get(entry_dir)
+        if names is None:
+            names = self.entries[entry_dir] = {}
+            with os.scandir(entry_dir) as entries:
+                for entry in entries:
+                    match = self.entry_name.fullmatch(entry.name)
+                    if match:
+                        names.setdefault(match.group(1), set()).add(entry.name)
+        return names
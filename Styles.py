@@ -125,6 +125,18 @@ TAB_STYLE = """
 # Additional widget styles
 IMAGE_LABEL_STYLE = "background-color: black;"
 
+FILMSTRIP_STYLE = f"""
+    QListWidget {{
+        background-color: {DARKER_BG};
+        color: {TEXT_COLOR};
+        border: none;
+    }}
+    QListWidget::item:selected {{
+        background-color: {LIGHT_BG};
+        border: 1px solid {BORDER_COLOR};
+    }}
+"""
+
 # Function to generate dynamic styles
 
 def get_color_preview_style(r, g, b):
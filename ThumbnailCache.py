@@ -0,0 +1,47 @@
+"""
+ThumbnailCache.py - Disk cache of downscaled previews for directory listings
+"""
+
+import os
+from PIL import Image
+from SourceCache import SourceFileCache
+
+# Thumbnails are stored in a hidden directory next to the source images
+THUMBNAIL_DIR_NAME = ".anycolor_thumbnails"
+
+
+class ThumbnailCache(SourceFileCache):
+    """Stores a downscaled copy of each image, invalidated by the source mtime and size"""
+    suffix = "png"
+
+    def __init__(self, directory, size=128, cache_dir=None):
+        super().__init__(directory, cache_dir or os.path.join(directory, THUMBNAIL_DIR_NAME), tag=f"{size}.")
+        self.size = size
+
+    def get(self, file_name):
+        """Return the thumbnail for file_name, creating it if missing or stale"""
+        source_path = os.path.join(self.directory, file_name)
+        stat = os.stat(source_path)
+        thumbnail_path = self.cache_path(file_name, stat)
+
+        if os.path.exists(thumbnail_path):
+            try:
+                with Image.open(thumbnail_path) as cached:
+                    return cached.convert("RGBA")
+            except OSError:
+                pass  # Unreadable cache entry, rebuild it below
+
+        thumbnail = make_thumbnail(source_path, self.size)
+        self.store(file_name, thumbnail_path, lambda f: thumbnail.save(f, "PNG", compress_level=1))
+        return thumbnail
+
+
+def make_thumbnail(path, size):
+    """Decode path at reduced resolution and return an RGBA thumbnail"""
+    with Image.open(path) as image:
+        # draft() lets formats that support it decode at a lower resolution
+        image.draft("RGBA", (size, size))
+        thumbnail = image.convert("RGBA")
+    # reducing_gap lets Pillow shrink with fast integer reduction first
+    thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    return thumbnail
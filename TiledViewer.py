@@ -0,0 +1,200 @@
+"""
+TiledViewer.py - Zoomable image view drawn from a mipmap pyramid of cached tiles
+"""
+
+import math
+from collections import OrderedDict
+from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QFrame
+from PyQt6.QtCore import Qt, QRectF
+from PyQt6.QtGui import QImage, QPixmap, QPainter, QColor
+
+TILE_SIZE = 256
+MAX_CACHED_TILES = 512  # About 128 MB of 256x256 RGBA tiles
+ZOOM_STEP = 1.25
+MAX_ZOOM = 32.0
+
+
+class MipmapPyramid:
+    """Successively halved copies of an RGBA image, converted to pixmap tiles on demand
+
+    Level 0 is the image itself and each further level halves it, down to a
+    single tile. Tiles are only converted when first drawn and the least
+    recently drawn ones are dropped past MAX_CACHED_TILES.
+    """
+    def __init__(self, image, tile_size=TILE_SIZE):
+        import numpy as np
+        from PIL import Image
+        self.tile_size = tile_size
+        # Keep a private copy so the next image can be diffed against it
+        self.pixels = np.array(image.convert("RGBA"))
+        self.levels = [Image.fromarray(self.pixels)]
+        while max(self.levels[-1].size) > tile_size:
+            self.levels.append(self.levels[-1].reduce(2))
+        self.tiles = OrderedDict()  # (level, tx, ty) -> QPixmap
+
+    @property
+    def size(self):
+        return self.levels[0].size
+
+    def level_for_scale(self, scale):
+        """Finest level that is not drawn more than 2x downscaled at the given view scale"""
+        if scale >= 1:
+            return 0
+        return min(len(self.levels) - 1, int(math.floor(math.log2(1 / scale))))
+
+    def tile(self, level, tx, ty):
+        """Return the pixmap of one tile of a level"""
+        key = (level, tx, ty)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+        image = self.levels[level]
+        left, top = tx * self.tile_size, ty * self.tile_size
+        crop = image.crop((left, top, min(left + self.tile_size, image.width),
+                           min(top + self.tile_size, image.height)))
+        data = crop.tobytes("raw", "RGBA")
+        qimage = QImage(data, crop.width, crop.height, crop.width * 4, QImage.Format.Format_RGBA8888)
+        pixmap = QPixmap.fromImage(qimage)
+        self.tiles[key] = pixmap
+        if len(self.tiles) > MAX_CACHED_TILES:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+    def update(self, image):
+        """Replace the image with a same-sized one, rebuilding only the tiles that changed
+
+        Returns the changed tiles as rectangles in image coordinates.
+        """
+        import numpy as np
+        from PIL import Image
+        pixels = np.asarray(image.convert("RGBA"))
+        changed = np.any(pixels != self.pixels, axis=2)
+        if not changed.any():
+            return []
+        rows = np.arange(0, changed.shape[0], self.tile_size)
+        cols = np.arange(0, changed.shape[1], self.tile_size)
+        dirty_grid = np.logical_or.reduceat(np.logical_or.reduceat(changed, rows, axis=0), cols, axis=1)
+        dirty = {(int(tx), int(ty)) for ty, tx in zip(*np.nonzero(dirty_grid))}
+        span = self.tile_size
+        changed_rects = [QRectF(tx * span, ty * span, span, span) for tx, ty in dirty]
+
+        self.pixels = np.array(pixels)
+        self.levels[0] = Image.fromarray(self.pixels)
+        self._drop_tiles(0, dirty)
+        for level in range(1, len(self.levels)):
+            # A tile covers the same area as 2x2 tiles of the level above it
+            dirty = {(tx // 2, ty // 2) for tx, ty in dirty}
+            source = self.levels[level - 1]
+            target = self.levels[level]
+            for tx, ty in dirty:
+                left, top = tx * self.tile_size, ty * self.tile_size
+                box = (left * 2, top * 2,
+                       min((left + self.tile_size) * 2, source.width),
+                       min((top + self.tile_size) * 2, source.height))
+                target.paste(source.crop(box).reduce(2), (left, top))
+            self._drop_tiles(level, dirty)
+        return changed_rects
+
+    def _drop_tiles(self, level, dirty):
+        for tx, ty in dirty:
+            self.tiles.pop((level, tx, ty), None)
+
+
+class TiledImageItem(QGraphicsItem):
+    """Scene item that draws only the exposed tiles of the level matching the zoom"""
+    def __init__(self, pyramid):
+        super().__init__()
+        self.pyramid = pyramid
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        width, height = self.pyramid.size
+        return QRectF(0, 0, width, height)
+
+    def paint(self, painter, option, widget=None):
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        level = self.pyramid.level_for_scale(scale)
+        factor = 2 ** level
+        span = self.pyramid.tile_size * factor  # Image pixels covered by one tile
+
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        level_image = self.pyramid.levels[level]
+        last_tx = (level_image.width - 1) // self.pyramid.tile_size
+        last_ty = (level_image.height - 1) // self.pyramid.tile_size
+        first_tx, first_ty = int(exposed.left() // span), int(exposed.top() // span)
+        end_tx = min(last_tx, int(math.ceil(exposed.right() / span)))
+        end_ty = min(last_ty, int(math.ceil(exposed.bottom() / span)))
+
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        # Coarse levels round their size up, so keep their last tiles inside the image
+        painter.setClipRect(self.boundingRect())
+        for ty in range(first_ty, end_ty + 1):
+            for tx in range(first_tx, end_tx + 1):
+                pixmap = self.pyramid.tile(level, tx, ty)
+                target = QRectF(tx * span, ty * span, pixmap.width() * factor, pixmap.height() * factor)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+
+class TiledImageView(QGraphicsView):
+    """Image viewer with wheel zoom, drag panning and fit-to-window on double click"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setBackgroundBrush(QColor(0, 0, 0))
+        self.item = None
+        self.fit = True  # Follow the window size until the user zooms
+
+    def set_background(self, color):
+        """Set the color shown through transparent pixels"""
+        self.setBackgroundBrush(QColor(*color))
+
+    def set_image(self, image):
+        """Show image; a same-sized image only repaints the tiles that changed"""
+        if image is None:
+            self.scene().clear()
+            self.item = None
+            return
+        if self.item and self.item.pyramid.size == image.size:
+            for rect in self.item.pyramid.update(image):
+                self.item.update(rect)
+            return
+
+        self.scene().clear()
+        self.item = TiledImageItem(MipmapPyramid(image))
+        self.scene().addItem(self.item)
+        self.scene().setSceneRect(self.item.boundingRect())
+        self.fit_image()
+
+    def fit_image(self):
+        """Scale the whole image into the view"""
+        self.fit = True
+        if self.item:
+            self.fitInView(self.item, Qt.AspectRatioMode.KeepAspectRatio)
+
+    def image_fits(self):
+        """True if the whole image is visible at the current zoom"""
+        shown = self.mapFromScene(self.item.sceneBoundingRect()).boundingRect()
+        return shown.width() <= self.viewport().width() and shown.height() <= self.viewport().height()
+
+    def wheelEvent(self, event):
+        if not self.item:
+            return
+        factor = ZOOM_STEP ** (event.angleDelta().y() / 120)
+        factor = min(factor, MAX_ZOOM / self.transform().m11())
+        self.scale(factor, factor)
+        self.fit = False
+        # Zooming out stops at the fitted size
+        if factor < 1 and self.image_fits():
+            self.fit_image()
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_image()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.fit:
+            self.fit_image()
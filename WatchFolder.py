@@ -0,0 +1,236 @@
+"""
+WatchFolder.py - Converts images with saved settings as they are added to or changed in a directory
+"""
+
+import argparse
+import os
+import threading
+import time
+from BatchConvert import convert_files, load_settings
+from BatchManifest import BatchManifest
+from DirectoryScanner import compile_patterns, parse_patterns, DEFAULT_PATTERNS
+from ImageWriter import BackgroundImageWriter
+from PixelCache import PixelCache
+from RenderCache import RenderCache
+from SharedImages import SharedRenderPool
+
+DEFAULT_PATTERN = "; ".join(DEFAULT_PATTERNS)
+POLL_INTERVAL = 0.5
+# A file is converted once it has stayed unchanged this long, so half-written saves are skipped
+DEBOUNCE_SECONDS = 1.0
+# Polls in between only stat the files waiting to settle, unless the directory itself changed;
+# a full listing every this many seconds catches files rewritten in place
+RESCAN_SECONDS = 2.0
+# The output manifest is written at most this often while watching, and on close
+MANIFEST_SAVE_SECONDS = 5.0
+
+
+class FolderWatcher:
+    """Polls a directory and reports files that changed and then stayed unchanged for debounce seconds
+
+    The directory is listed when its mtime changes (a file was added,
+    removed or replaced) and otherwise every rescan seconds; polls in between
+    only stat the files still settling. A file is only opened again once its
+    mtime or size differs from the state it was last converted in.
+    """
+    def __init__(self, directory, pattern=DEFAULT_PATTERN, debounce=DEBOUNCE_SECONDS, rescan=RESCAN_SECONDS):
+        self.directory = directory
+        # Matched like the window's and job specs' patterns: several globs, ignoring case
+        self.match = compile_patterns(parse_patterns(pattern)).match
+        self.debounce = debounce
+        self.rescan = rescan
+        self.done = {}  # file name -> (mtime_ns, size) it was last handled in
+        self.pending = {}  # file name -> ((mtime_ns, size), time that state was first seen)
+        self.directory_mtime = None
+        self.scanned_at = None
+
+    def scan(self):
+        """Current (mtime_ns, size) of every matching file"""
+        states = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not self.match(entry.name):
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        states[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    continue  # Removed while listing
+        return states
+
+    def scan_pending(self):
+        """Current (mtime_ns, size) of the files waiting to settle"""
+        states = {}
+        for name in self.pending:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue  # Removed
+            states[name] = (stat.st_mtime_ns, stat.st_size)
+        return states
+
+    def needs_scan(self, now):
+        """True if the whole directory has to be listed, because it changed or the rescan interval passed"""
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime = None  # Let the listing report it
+        if mtime == self.directory_mtime and self.scanned_at is not None and now - self.scanned_at < self.rescan:
+            return False
+        self.directory_mtime = mtime
+        self.scanned_at = now
+        return True
+
+    def poll(self, now=None):
+        """Return the names of changed files that have settled, oldest change first"""
+        now = time.monotonic() if now is None else now
+        full = self.needs_scan(now)
+        states = self.scan() if full else self.scan_pending()
+        for name, state in states.items():
+            if self.done.get(name) == state:
+                self.pending.pop(name, None)
+            elif name not in self.pending or self.pending[name][0] != state:
+                self.pending[name] = (state, now)  # Changed again, restart its wait
+
+        # Forget removed files, so one put back is converted again
+        for name in [name for name in self.pending if name not in states]:
+            del self.pending[name]
+        if full:
+            for name in [name for name in self.done if name not in states]:
+                del self.done[name]
+
+        ready = [(since, name) for name, (_, since) in self.pending.items() if now - since >= self.debounce]
+        return [name for _, name in sorted(ready)]
+
+    def mark_done(self, names):
+        """Record files as handled in the state they were reported ready in"""
+        for name in names:
+            entry = self.pending.pop(name, None)
+            if entry:
+                self.done[name] = entry[0]
+
+
+class WatchFolder:
+    """Keeps an output directory converted from an input directory with one parameter set
+
+    The render worker processes, the output manifest, the image writer, the
+    render cache and loaded LUTs stay warm between changes, and decoded
+    pixels are kept in a PixelCache, so a changed file only costs its own
+    conversion. The manifest is written every MANIFEST_SAVE_SECONDS at most
+    and on close; outputs converted after the last write are converted
+    again if the watcher is killed.
+    """
+    def __init__(self, input_dir, output_dir, parameters, output_format="PNG", transparency=True,
+                 pattern=DEFAULT_PATTERN, debounce=DEBOUNCE_SECONDS, processes=0,
+                 pixel_cache=True, render_cache=None, log=print, compress_level=None, strategy=None,
+                 rescan=RESCAN_SECONDS):
+        if os.path.abspath(input_dir) == os.path.abspath(output_dir):
+            raise ValueError("The output directory must differ from the watched directory")
+        self.input_dir = input_dir
+        self.variants = [(output_dir, parameters)]
+        self.output_format = output_format
+        self.transparency = transparency
+        self.compress_level = compress_level
+        self.strategy = strategy
+        self.pixel_cache = PixelCache(input_dir) if pixel_cache else None
+        self.render_cache = render_cache
+        self.log = log
+        self.watcher = FolderWatcher(input_dir, pattern, debounce, rescan)
+        self.render_pool = SharedRenderPool(processes) if processes else None
+        self.manifests = [BatchManifest(output_dir)]
+        self.writer = BackgroundImageWriter(output_format=output_format, compress_level=compress_level,
+                                            strategy=strategy)
+        self.unsaved = False
+        self.saved_at = time.monotonic()
+
+    def process(self, now=None):
+        """Convert the files that have settled since the last call; returns how many were rendered"""
+        ready = self.watcher.poll(now)
+        if not ready:
+            self.save_manifests()
+            return 0
+        started = time.perf_counter()
+        processed, skipped, errors = convert_files(
+            self.input_dir, ready, self.variants,
+            output_format=self.output_format, transparency=self.transparency,
+            compress_level=self.compress_level, strategy=self.strategy,
+            pixel_cache=self.pixel_cache, render_cache=self.render_cache,
+            render_pool=self.render_pool, manifests=self.manifests, writer=self.writer)
+        # Failed files are retried once they change again
+        self.watcher.mark_done(ready)
+        if processed:
+            self.unsaved = True
+        self.save_manifests()
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.log(f"Converted {processed} of {len(ready)} changed images in {elapsed:.0f} ms"
+                 + (f", {skipped} unchanged" if skipped else ""))
+        for file_path, error in errors:
+            self.log(f"Error converting {os.path.basename(file_path)}: {error}")
+        return processed
+
+    def run(self, interval=POLL_INTERVAL, stop=None):
+        """Poll every interval seconds until stop (a threading.Event) is set"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            self.process()
+            stop.wait(interval)
+
+    def save_manifests(self, force=False):
+        """Write the output manifest if it changed and MANIFEST_SAVE_SECONDS have passed (or force)"""
+        if not self.unsaved or (not force and time.monotonic() - self.saved_at < MANIFEST_SAVE_SECONDS):
+            return
+        for manifest in self.manifests:
+            manifest.save()
+        self.unsaved = False
+        self.saved_at = time.monotonic()
+
+    def close(self):
+        self.writer.close()
+        self.save_manifests(force=True)
+        if self.render_pool:
+            self.render_pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert new or modified images in a directory with saved AnyColor settings")
+    parser.add_argument("settings", help="settings file saved from AnyColor")
+    parser.add_argument("input_dir", help="directory to watch")
+    parser.add_argument("output_dir", help="directory to write the converted images to")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN, help="file names to convert, several separated by ';' (default: %(default)s)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                        help="seconds a file must stay unchanged before it is converted")
+    parser.add_argument("--rescan", type=float, default=RESCAN_SECONDS,
+                        help="seconds between full listings, which catch files rewritten in place")
+    parser.add_argument("--processes", type=int, default=0, help="render in this many worker processes")
+    parser.add_argument("--no-pixel-cache", action="store_true", help="do not keep decoded pixels on disk")
+    parser.add_argument("--once", action="store_true", help="convert what is out of date and exit")
+    args = parser.parse_args(argv)
+
+    parameters, output = load_settings(args.settings)
+    with WatchFolder(args.input_dir, args.output_dir, parameters, **output,
+                     pattern=args.pattern, debounce=0 if args.once else args.debounce,
+                     rescan=args.rescan, processes=args.processes, pixel_cache=not args.no_pixel_cache,
+                     render_cache=RenderCache()) as watch:
+        if args.once:
+            watch.process()
+            return
+        print(f"Watching {args.input_dir} for {args.pattern}, press Ctrl+C to stop")
+        try:
+            watch.run(args.interval)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()